@@ -1,82 +1,434 @@
-import os, json, sqlite3
+import os, time, asyncio, importlib, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
 from llm_client import LLMClient
-from planner import build_messages, parse_plan
+from planner import build_messages, parse_plan, plan_calls
+from router import ROUTER, route, skip_reflect, format_answer
+from context import CONTEXT_HISTORY_MESSAGES, CONTEXT_PAGE_TOKENS, observation_json, observations_json, truncate_text
+from summarizer import CONV_SUMMARY, Summarizer, load as load_summary
 from memory import Memory
-from tools import web_search, notes, tasks, rag, python_tool
-from tools import news as news_tool
+from storage import DEFAULT_SESSION
+from executor import run_blocking
+import metrics
+from metrics import bound, span
+
+WARMUP = os.getenv("JARVIS_WARMUP", "false").lower() == "true"
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "false").lower() == "true"
+AGENT_MAX_STEPS = int(os.getenv("AGENT_MAX_STEPS", "1"))  # plan/act rounds per turn
+AGENT_TIME_BUDGET = float(os.getenv("AGENT_TIME_BUDGET", "120"))  # seconds per turn
+AGENT_SESSIONS = int(os.getenv("AGENT_SESSIONS", "1024"))  # session handles kept in memory (LRU)
+
+TOOLS = {"news_query", "web_search", "notes_add", "notes_find", "task_add", "task_list", "task_done", "rag_query", "python_calc"}
+
+
+def _tool(name: str):
+    """Import a tool module on first use.
+
+    Tool modules pull in heavy dependencies (ddgs, readability, lxml, numpy,
+    the vector store), so a request that only adds a note never loads them.
+    """
+    return importlib.import_module(f"tools.{name}")
+
+
+def warmup(background: bool = True):
+    """Preload tool modules, the embedder and the vector store.
+
+    Opt-in (JARVIS_WARMUP=true or an explicit call) so the first rag_query or
+    news_query doesn't pay for model loading inside a user request.
+    """
+    def run():
+        for name in ("notes", "tasks", "python_tool", "web_search", "news"):
+            _tool(name)
+        _tool("rag").warmup()
+
+    if not background:
+        run()
+        return None
+    t = threading.Thread(target=run, name="jarvis-warmup", daemon=True)
+    t.start()
+    return t
+
 
 class Agent:
     def __init__(self, db_path: str):
-        self.mem = Memory(db_path)
         self.llm = LLMClient()
         self.db_path = db_path
+        self._sessions = OrderedDict()
+        self._sessions_lock = threading.Lock()
+        default = self._session(DEFAULT_SESSION)
+        self.mem = default["mem"]
+        self.db = self.mem.db
+        self.summarizer = default["summarizer"]
+        self.cache = None
+        if ANSWER_CACHE:
+            # imported here so numpy and the embedder stay off the default path
+            from answer_cache import AnswerCache
+            self.cache = AnswerCache(db_path)
+
+    def _session(self, session_id: str) -> dict:
+        """{"id", "mem", "summarizer"} for session_id.
+
+        Handles are views over the shared database, so evicting one from the
+        LRU only drops in-memory state; the session's rows stay on disk.
+        """
+        with self._sessions_lock:
+            sess = self._sessions.get(session_id)
+            if sess is None:
+                mem = Memory(self.db_path, session_id)
+                sess = self._sessions[session_id] = {
+                    "id": session_id, "mem": mem,
+                    "summarizer": Summarizer(mem, self._llm) if CONV_SUMMARY else None,
+                }
+                if len(self._sessions) > AGENT_SESSIONS:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            return sess
 
     def _get_connection(self):
-        return sqlite3.connect(self.db_path)
+        """A pooled connection for the notes/tasks tools (context manager)"""
+        return self.db.connection()
 
     def _llm(self, messages):
         return self.llm.chat(messages)
 
-    def step(self, user_input: str) -> str:
-        history = self.mem.last_k(8)
-        plan_msg = self.llm.chat(build_messages(history, user_input))
-        plan = parse_plan(plan_msg)
-        tool = plan.get("tool", "final")
-        args = plan.get("args", {})
+    async def _allm(self, messages):
+        return await self.llm.achat(messages)
 
+    def _act(self, tool: str, args: dict, user_input: str, sess: dict):
+        """Run one tool call for sess and return its observation"""
         obs = None
         if tool == "news_query":
             q = args.get("query") or user_input
-            bundle = news_tool.news_bundle(q, llm_call=self._llm)
+            bundle = _tool("news").news_bundle(q, llm_call=self._llm)
             obs = bundle
         elif tool == "web_search":
             q = args.get("query") or user_input
+            web_search = _tool("web_search")
             results = web_search.search(q, 4)
             # fetch top1 text
             content = web_search.fetch_clean(results[0]["href"]) if results else ""
-            obs = {"results": results, "content": content[:1200]}
+            obs = {"results": results, "content": truncate_text(content, CONTEXT_PAGE_TOKENS)}
         elif tool == "notes_add":
-            conn = self._get_connection()
-            obs = notes.add(conn, args.get("text", user_input))
-            conn.close()
+            with self._get_connection() as conn:
+                obs = _tool("notes").add(conn, args.get("text", user_input), sess["id"])
         elif tool == "notes_find":
-            conn = self._get_connection()
-            obs = notes.find(conn, args.get("query", ""))
-            conn.close()
+            with self._get_connection() as conn:
+                obs = _tool("notes").find(
+                    conn, args.get("query", ""), int(args.get("limit", 10)), int(args.get("offset", 0)), sess["id"]
+                )
         elif tool == "task_add":
-            conn = self._get_connection()
-            obs = tasks.add(conn, args.get("text", user_input))
-            conn.close()
+            tasks = _tool("tasks")
+            with self._get_connection() as conn:
+                if args.get("items"):
+                    obs = tasks.add_many(conn, args["items"], sess["id"])
+                else:
+                    obs = tasks.add(
+                        conn, args.get("text", user_input), args.get("due"), args.get("priority", 0), args.get("tags"), sess["id"]
+                    )
         elif tool == "task_list":
-            conn = self._get_connection()
-            obs = tasks.list_tasks(conn, True)
-            conn.close()
+            with self._get_connection() as conn:
+                obs = _tool("tasks").list_tasks(
+                    conn, not args.get("all"), args.get("limit", 20), args.get("cursor"),
+                    args.get("min_priority"), args.get("tag"), args.get("due_before"), sess["id"],
+                )
         elif tool == "task_done":
-            conn = self._get_connection()
-            obs = tasks.mark_done(conn, int(args.get("id", 0)))
-            conn.close()
+            tasks = _tool("tasks")
+            with self._get_connection() as conn:
+                if args.get("ids"):
+                    obs = tasks.mark_done_many(conn, args["ids"], sess["id"])
+                else:
+                    obs = tasks.mark_done(conn, int(args.get("id", 0)), sess["id"])
         elif tool == "rag_query":
-            hits = rag.query_for_agent(args.get("query", user_input))
+            hits = _tool("rag").query_for_agent(args.get("query", user_input))
             obs = {"chunks": hits}
         elif tool == "python_calc":
             try:
-                obs = {"result": python_tool.calc(args.get("expr", "0"))}
+                obs = {"result": _tool("python_tool").calc(args.get("expr", "0"))}
             except Exception as e:
                 obs = {"error": str(e)}
-        elif tool == "final":
-            answer = args.get("answer") or plan.get("thought") or "Done."
-            self.mem.add_conv("user", user_input)
-            self.mem.add_conv("assistant", answer)
-            return answer
         else:
             obs = {"error": f"unknown tool {tool}"}
+        return obs
+
+    async def _aact(self, tool: str, args: dict, user_input: str, sess: dict):
+        """Async _act: network tools await their I/O, everything else runs on the shared pool"""
+        if tool == "news_query":
+            q = args.get("query") or user_input
+            return await _tool("news").anews_bundle(q, allm_call=self._allm)
+        if tool == "web_search":
+            q = args.get("query") or user_input
+            web_search = _tool("web_search")
+            results = await web_search.asearch(q, 4)
+            # fetch top1 text
+            content = await web_search.afetch_clean(results[0]["href"]) if results else ""
+            return {"results": results, "content": truncate_text(content, CONTEXT_PAGE_TOKENS)}
+        return await run_blocking(self._act, tool, args, user_input, sess)
+
+    @staticmethod
+    def _tool_label(tool: str) -> str:
+        # tool names come from the LLM; keep the metric label set bounded
+        return tool if tool in TOOLS else "unknown"
+
+    def _act_timed(self, call: dict, user_input: str, sess: dict):
+        """(observation, seconds); tool errors become error observations"""
+        t0 = time.perf_counter()
+        try:
+            with span("tool", tool=self._tool_label(call["tool"])):
+                obs = self._act(call["tool"], call["args"], user_input, sess)
+        except Exception as e:
+            obs = {"error": str(e)}
+        return obs, time.perf_counter() - t0
+
+    def _act_many(self, calls: list[dict], user_input: str, sess: dict, timeout: float):
+        """Run independent tool calls concurrently; [(observation, seconds)] in call order.
 
-        # Reflect with observation
-        reflect_msgs = [
+        Calls still running after timeout are abandoned with an error observation.
+        """
+        # a single call goes through the pool too, so a hung tool is bounded by the same timeout
+        pool = ThreadPoolExecutor(max_workers=len(calls), thread_name_prefix="jarvis-tool")
+        futures = [pool.submit(bound(self._act_timed), c, user_input, sess) for c in calls]
+        wait(futures, timeout=max(timeout, 0))
+        pool.shutdown(wait=False)
+        return [f.result() if f.done() else ({"error": "timed out"}, timeout) for f in futures]
+
+    async def _aact_timed(self, call: dict, user_input: str, sess: dict):
+        t0 = time.perf_counter()
+        try:
+            with span("tool", tool=self._tool_label(call["tool"])):
+                obs = await self._aact(call["tool"], call["args"], user_input, sess)
+        except Exception as e:
+            obs = {"error": str(e)}
+        return obs, time.perf_counter() - t0
+
+    async def _aact_many(self, calls: list[dict], user_input: str, sess: dict, timeout: float):
+        if len(calls) == 1:
+            try:
+                return [await asyncio.wait_for(self._aact_timed(calls[0], user_input, sess), max(timeout, 0))]
+            except asyncio.TimeoutError:
+                return [({"error": "timed out"}, timeout)]
+        tasks = [asyncio.ensure_future(self._aact_timed(c, user_input, sess)) for c in calls]
+        await asyncio.wait(tasks, timeout=max(timeout, 0))
+        for t in tasks:
+            t.cancel()
+        return [t.result() if t.done() and not t.cancelled() else ({"error": "timed out"}, timeout) for t in tasks]
+
+    def _reflect_messages(self, user_input: str, observations: list[dict]):
+        # a single tool call keeps the original bare-observation prompt
+        if len(observations) == 1:
+            obs = observation_json(observations[0]["observation"])
+        else:
+            obs = observations_json(observations)
+        return [
             {"role": "system", "content": "Craft a factual answer with a short digest and bullet citations (URLs)."},
-            {"role": "user", "content": f"User asked: {user_input}\nObservation: {json.dumps(obs)[:4000]}"}
+            {"role": "user", "content": f"User asked: {user_input}\nObservation: {obs}"}
         ]
-        answer = self.llm.chat(reflect_msgs)
-        self.mem.add_conv("user", user_input)
-        self.mem.add_conv("assistant", answer)
-        return answer
+
+    def _remember(self, sess: dict, user_input: str, answer: str):
+        sess["mem"].add_convs([("user", user_input), ("assistant", answer)])
+        if sess["summarizer"]:
+            sess["summarizer"].schedule()
+
+    def _cache_match(self, user_input: str, routed: dict = None):
+        """(cache entry or None, prompt embedding).
+
+        (None, None) when caching is off or the prompt was routed to a trivial
+        tool, which is cheaper to run than to embed.
+        """
+        if self.cache is None or (routed and skip_reflect(routed["tool"])):
+            return None, None
+        with span("answer_cache"):
+            return self.cache.match(user_input)
+
+    def _cache_add(self, user_input: str, emb, observations: list[dict], answer: str):
+        if emb is None:
+            return
+        tool = self.cache.entry_tool(o["tool"] for o in observations)
+        if tool:
+            obs = observations[0]["observation"] if len(observations) == 1 else observations
+            self.cache.add(user_input, emb, tool, obs, answer)
+
+    def _history(self, sess: dict):
+        """(rolling summary text, raw messages newer than the summary) of sess"""
+        summary = load_summary(sess["mem"]) if sess["summarizer"] else {"text": "", "upto_id": 0}
+        return summary["text"], sess["mem"].last_k(CONTEXT_HISTORY_MESSAGES, after_id=summary["upto_id"])
+
+    def _plan(self, sess: dict, user_input: str, observations: list[dict] = None) -> dict:
+        with span("plan"):
+            summary, history = self._history(sess)
+            return parse_plan(self.llm.chat(build_messages(history, user_input, observations, summary)))
+
+    async def _aplan(self, sess: dict, user_input: str, observations: list[dict] = None) -> dict:
+        with span("plan"):
+            summary, history = await run_blocking(self._history, sess)
+            return parse_plan(await self.llm.achat(build_messages(history, user_input, observations, summary)))
+
+    @staticmethod
+    def _direct_answer(plan: dict) -> str:
+        return (plan.get("args") or {}).get("answer") or plan.get("thought") or "Done."
+
+    @staticmethod
+    def _result(answer: str, tool: str, cached: bool = False, routed: bool = False, steps=None, seconds=0.0) -> dict:
+        return {"answer": answer, "tool": tool, "cached": cached, "routed": routed,
+                "steps": steps or [], "seconds": round(seconds, 3)}
+
+    def _events(self, user_input: str, stream: bool, session_id: str):
+        """The agent loop as events; run() collects them, step_stream() forwards them.
+
+        Up to AGENT_MAX_STEPS rounds of plan -> act, where a plan may hold
+        several independent calls that run concurrently, each round feeding
+        its observations back to the planner. Stops at tool=final, the step
+        limit or AGENT_TIME_BUDGET, then reflects once over all observations.
+        """
+        t_start = time.perf_counter()
+        deadline = t_start + AGENT_TIME_BUDGET
+        sess = self._session(session_id)
+        routed = route(user_input) if ROUTER else None
+        hit, emb = self._cache_match(user_input, routed)
+        if hit:
+            yield {"type": "cache", "tool": hit["tool"], "similarity": hit["similarity"]}
+            yield {"type": "token", "text": hit["answer"]}
+            self._remember(sess, user_input, hit["answer"])
+            yield {"type": "final", "answer": hit["answer"], "tool": hit["tool"], "cached": True, "routed": False,
+                   "steps": [], "seconds": time.perf_counter() - t_start}
+            return
+
+        plan = routed or self._plan(sess, user_input)
+        observations, steps, answer = [], [], None
+        for n in range(1, AGENT_MAX_STEPS + 1):
+            calls = plan_calls(plan)
+            yield {"type": "plan", "step": n, "calls": calls, "thought": plan.get("thought", ""), "routed": routed is not None}
+            if not calls:
+                if not observations:
+                    answer = self._direct_answer(plan)
+                break
+            for c in calls:
+                yield {"type": "tool", "tool": c["tool"], "step": n}
+            t0 = time.perf_counter()
+            results = self._act_many(calls, user_input, sess, deadline - t0)
+            timings = []
+            for c, (obs, secs) in zip(calls, results):
+                observations.append({"tool": c["tool"], "args": c["args"], "observation": obs})
+                timings.append({"tool": c["tool"], "seconds": round(secs, 3)})
+                yield {"type": "observation", "tool": c["tool"], "observation": obs, "step": n}
+            steps.append({"step": n, "calls": timings, "seconds": round(time.perf_counter() - t0, 3)})
+            # routed prompts are single explicit commands
+            if routed or n == AGENT_MAX_STEPS or time.perf_counter() >= deadline:
+                break
+            plan = self._plan(sess, user_input, observations)
+
+        tool = observations[0]["tool"] if observations else "final"
+        if answer is not None:
+            yield {"type": "token", "text": answer}
+        elif routed and skip_reflect(tool):
+            answer = format_answer(tool, observations[0]["args"], observations[0]["observation"])
+            yield {"type": "token", "text": answer}
+        elif stream:
+            # Reflect with observations, streaming tokens as they arrive
+            parts = []
+            with span("reflect"):
+                for delta in self.llm.chat_stream(self._reflect_messages(user_input, observations)):
+                    parts.append(delta)
+                    yield {"type": "token", "text": delta}
+            answer = "".join(parts).strip()
+        else:
+            with span("reflect"):
+                answer = self.llm.chat(self._reflect_messages(user_input, observations))
+            yield {"type": "token", "text": answer}
+
+        self._remember(sess, user_input, answer)
+        if observations:
+            self._cache_add(user_input, emb, observations, answer)
+        yield {"type": "final", **self._result(answer, tool, routed=routed is not None, steps=steps,
+                                               seconds=time.perf_counter() - t_start)}
+
+    def _run(self, user_input: str, session_id: str) -> dict:
+        for ev in self._events(user_input, stream=False, session_id=session_id):
+            if ev["type"] == "final":
+                return {k: v for k, v in ev.items() if k != "type"}
+
+    @staticmethod
+    def _traced(result: dict, tr: dict, trace: bool) -> dict:
+        tr.update(tool=result["tool"], cached=result["cached"], routed=result["routed"])
+        if trace:
+            result["trace"] = {"spans": tr["spans"]}
+        return result
+
+    def run(self, user_input: str, session_id: str = DEFAULT_SESSION, trace: bool = False) -> dict:
+        """Answer user_input in session_id's conversation.
+
+        Returns answer, the (first) tool used, whether it came from the answer
+        cache or skipped the planner via the router, per-step tool timings and
+        total seconds. History, notes and tasks are those of session_id only.
+        With trace, also the timed spans (plan, tool, llm, fetch, sqlite, ...)
+        of this request.
+        """
+        if not (trace or metrics.tracing()):
+            return self._run(user_input, session_id)
+        with metrics.trace(session=session_id, prompt=user_input) as tr:
+            return self._traced(self._run(user_input, session_id), tr, trace)
+
+    def step(self, user_input: str, session_id: str = DEFAULT_SESSION) -> str:
+        return self.run(user_input, session_id)["answer"]
+
+    def step_stream(self, user_input: str, session_id: str = DEFAULT_SESSION):
+        """Like run, but yields events as they happen.
+
+        Events are dicts with a "type" of plan, tool, observation (one per
+        tool call, tagged with its step), token (a chunk of the final answer)
+        and finally final (the run() result). A cache hit yields a single
+        cache event instead of plan/tool/observation.
+        """
+        return self._events(user_input, stream=True, session_id=session_id)
+
+    async def arun(self, user_input: str, session_id: str = DEFAULT_SESSION, trace: bool = False) -> dict:
+        """Non-blocking run: LLM and network I/O are awaited, blocking work is offloaded"""
+        if not (trace or metrics.tracing()):
+            return await self._arun(user_input, session_id)
+        with metrics.trace(session=session_id, prompt=user_input) as tr:
+            return self._traced(await self._arun(user_input, session_id), tr, trace)
+
+    async def _arun(self, user_input: str, session_id: str) -> dict:
+        t_start = time.perf_counter()
+        deadline = t_start + AGENT_TIME_BUDGET
+        sess = self._session(session_id)
+        routed = route(user_input) if ROUTER else None
+        hit, emb = await run_blocking(self._cache_match, user_input, routed)
+        if hit:
+            await run_blocking(self._remember, sess, user_input, hit["answer"])
+            return self._result(hit["answer"], hit["tool"], cached=True, seconds=time.perf_counter() - t_start)
+
+        plan = routed or await self._aplan(sess, user_input)
+        observations, steps, answer = [], [], None
+        for n in range(1, AGENT_MAX_STEPS + 1):
+            calls = plan_calls(plan)
+            if not calls:
+                if not observations:
+                    answer = self._direct_answer(plan)
+                break
+            t0 = time.perf_counter()
+            results = await self._aact_many(calls, user_input, sess, deadline - t0)
+            timings = []
+            for c, (obs, secs) in zip(calls, results):
+                observations.append({"tool": c["tool"], "args": c["args"], "observation": obs})
+                timings.append({"tool": c["tool"], "seconds": round(secs, 3)})
+            steps.append({"step": n, "calls": timings, "seconds": round(time.perf_counter() - t0, 3)})
+            if routed or n == AGENT_MAX_STEPS or time.perf_counter() >= deadline:
+                break
+            plan = await self._aplan(sess, user_input, observations)
+
+        tool = observations[0]["tool"] if observations else "final"
+        if answer is None:
+            if routed and skip_reflect(tool):
+                answer = format_answer(tool, observations[0]["args"], observations[0]["observation"])
+            else:
+                # Reflect with observations
+                with span("reflect"):
+                    answer = await self.llm.achat(self._reflect_messages(user_input, observations))
+        await run_blocking(self._remember, sess, user_input, answer)
+        if observations:
+            await run_blocking(self._cache_add, user_input, emb, observations, answer)
+        return self._result(answer, tool, routed=routed is not None, steps=steps, seconds=time.perf_counter() - t_start)
+
+    async def astep(self, user_input: str, session_id: str = DEFAULT_SESSION) -> str:
+        return (await self.arun(user_input, session_id))["answer"]
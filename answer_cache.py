@@ -0,0 +1,108 @@
+import os, json, time, threading
+import numpy as np
+from storage import get_db
+
+
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))  # cosine similarity
+ANSWER_CACHE_MAX = int(os.getenv("ANSWER_CACHE_MAX", "2000"))
+
+# How long an answer stays reusable, per tool (seconds). Tools missing here
+# are never cached: writes (notes_add, task_add, task_done), reads of state
+# those writes change (notes_find, task_list), python_calc (prompts that
+# differ only in their numbers embed almost identically, and it is cheaper
+# to run than to embed) and plain conversational turns.
+FRESHNESS = {
+    "news_query": int(os.getenv("ANSWER_CACHE_NEWS_TTL", "600")),
+    "web_search": int(os.getenv("ANSWER_CACHE_WEB_TTL", "3600")),
+    "rag_query": int(os.getenv("ANSWER_CACHE_RAG_TTL", "86400")),
+}
+
+
+class AnswerCache:
+    """Semantic cache of (prompt, tool, observation, answer) turns.
+
+    Prompts are embedded with the shared embedder; a new prompt whose cosine
+    similarity to a stored one is above the threshold, and whose entry is
+    still inside its tool's freshness window, reuses the stored answer.
+    Embeddings of live entries are kept in memory as one matrix. Entries are
+    shared across sessions: only tools over shared data are cacheable.
+    """
+
+    def __init__(self, db_path: str, threshold: float = ANSWER_CACHE_THRESHOLD, max_entries: int = ANSWER_CACHE_MAX):
+        self.db = get_db(db_path)
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with self.db.transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS answer_cache (id INTEGER PRIMARY KEY, prompt TEXT, tool TEXT, "
+                "observation TEXT, answer TEXT, embedding BLOB, created_at REAL)"
+            )
+            rows = conn.execute(
+                "SELECT id, prompt, tool, answer, embedding, created_at FROM answer_cache ORDER BY id DESC LIMIT ?", (max_entries,)
+            ).fetchall()[::-1]
+        self._entries = [
+            {"id": i, "prompt": p, "tool": t, "answer": a, "created_at": c} for i, p, t, a, _, c in rows
+        ]
+        self._matrix = np.stack([np.frombuffer(e, dtype=np.float32) for *_, e, _ in rows]) if rows else None
+
+    @staticmethod
+    def cacheable(tool: str) -> bool:
+        return tool in FRESHNESS
+
+    @staticmethod
+    def entry_tool(tools) -> str:
+        """Tool to file a multi-tool answer under: the one that goes stale
+        first, or None if any of them is not cacheable"""
+        tools = set(tools)
+        if not tools or not all(t in FRESHNESS for t in tools):
+            return None
+        return min(tools, key=FRESHNESS.get)
+
+    def _embed(self, prompt: str) -> np.ndarray:
+        from embeddings import encode
+        v = encode([prompt])[0]
+        return v / max(float(np.linalg.norm(v)), 1e-12)
+
+    def match(self, prompt: str):
+        """(entry or None, prompt embedding)"""
+        emb = self._embed(prompt)
+        with self._lock:
+            if self._matrix is None:
+                self.misses += 1
+                return None, emb
+            sims = self._matrix @ emb
+            now = time.time()
+            for i in np.argsort(-sims):
+                if sims[i] < self.threshold:
+                    break
+                e = self._entries[i]
+                if now - e["created_at"] <= FRESHNESS.get(e["tool"], 0):
+                    self.hits += 1
+                    return {**e, "similarity": float(sims[i])}, emb
+            self.misses += 1
+            return None, emb
+
+    def add(self, prompt: str, emb: np.ndarray, tool: str, observation, answer: str):
+        if not self.cacheable(tool):
+            return
+        now = time.time()
+        with self.db.transaction() as conn:
+            cur = conn.execute(
+                "INSERT INTO answer_cache(prompt, tool, observation, answer, embedding, created_at) VALUES (?,?,?,?,?,?)",
+                (prompt, tool, json.dumps(observation), answer, np.asarray(emb, dtype=np.float32).tobytes(), now),
+            )
+            # keep the table bounded as well as the in-memory matrix
+            conn.execute("DELETE FROM answer_cache WHERE id <= ?", (cur.lastrowid - self.max_entries,))
+        with self._lock:
+            self._entries.append({"id": cur.lastrowid, "prompt": prompt, "tool": tool, "answer": answer, "created_at": now})
+            row = np.asarray(emb, dtype=np.float32)[None, :]
+            self._matrix = row if self._matrix is None else np.vstack([self._matrix, row])
+            if len(self._entries) > self.max_entries:
+                self._entries = self._entries[-self.max_entries:]
+                self._matrix = self._matrix[-self.max_entries:]
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
@@ -1,6 +1,11 @@
+import json
 from fastapi import FastAPI
-from pydantic import BaseModel
-from agent import Agent
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from agent import Agent, WARMUP, warmup
+from storage import DEFAULT_SESSION
+from tools import http_cache
+import metrics
 
 
 app = FastAPI(
@@ -11,8 +16,24 @@ app = FastAPI(
 agent = Agent(db_path="jarvis.db")
 
 
+@app.on_event("startup")
+async def startup():
+    # Opt-in: preload embedder and vector store in the background
+    if WARMUP:
+        warmup()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await agent.llm.aclose()
+
+
 class Query(BaseModel):
     prompt: str
+    # each session (user, chat, ...) has its own history, notes and tasks
+    session_id: str = Field(DEFAULT_SESSION, min_length=1, max_length=128)
+    # include per-stage timings (plan, tool, llm, fetch, sqlite, ...) in the response
+    trace: bool = False
 
 
 @app.get("/")
@@ -22,8 +43,10 @@ async def root():
         "description": "Local-first AI agent with advanced capabilities",
         "endpoints": {
             "/ask": "POST - Query the agent with prompts",
+            "/ask/stream": "POST - Same as /ask, streamed as NDJSON events",
             "/docs": "GET - Interactive API documentation",
-            "/health": "GET - Health check"
+            "/health": "GET - Health check",
+            "/metrics": "GET - Prometheus metrics (per-stage latency histograms, LLM tokens)"
         },
         "examples": {
             "news": "news: india top headlines today",
@@ -38,10 +61,25 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "version": "0.2"}
+    return {"status": "healthy", "version": "0.2", "llm": agent.llm.metrics(), "http_cache": await http_cache.astats(),
+            "answer_cache": agent.cache.stats() if agent.cache else {"enabled": False}}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.post("/ask")
 async def ask(q: Query):
-    answer = agent.step(q.prompt)
-    return {"answer": answer}
+    # answer plus tool, cached/routed flags and per-step timings
+    return await agent.arun(q.prompt, q.session_id, trace=q.trace)
+
+
+@app.post("/ask/stream")
+def ask_stream(q: Query):
+    # Sync generator: Starlette iterates it in its threadpool, off the event loop
+    def events():
+        for ev in agent.step_stream(q.prompt, q.session_id):
+            yield json.dumps(ev) + "\n"
+    return StreamingResponse(events(), media_type="application/x-ndjson")
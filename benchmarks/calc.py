@@ -0,0 +1,72 @@
+"""Micro-benchmark: the AST-compiled calculator vs. the original eval() one.
+
+    python benchmarks/calc.py
+    python benchmarks/calc.py --number 20000
+
+Times repeated evaluation of typical calc: expressions (cached closures
+vs. eval re-parsing the string every call), then how fast hostile inputs
+are rejected. Exits non-zero if any hostile input is accepted.
+"""
+import os, sys, time, math, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tools.python_tool import calc, CalcError
+
+EXPRESSIONS = [
+    "2**10 + 100",
+    "(80000 * 1.15**3 - 80000) / 3",
+    "abs(-42.5) * 3 - 7 // 2",
+    "round(1234.5678, 2) + 17 % 5",
+    "((1 + 2) * (3 + 4) - 5) / (6 - 7 * 8)",
+]
+HOSTILE = [
+    "9**9**9",
+    "3**13999",
+    "3^13999",
+    "pow(3, 13999)",
+    "prod(2**13000, 2**13000)",
+    "2**10**8",
+    "factorial(10**6)",
+    "range(10**12)",
+    "().__class__.__bases__[0].__subclasses__()",
+    "__import__('os').system('true')",
+    "-" * 1999 + "1",
+]
+
+
+def legacy_calc(expr: str):
+    """The pre-rewrite implementation, kept verbatim for comparison"""
+    allowed_names = {k: __builtins__[k] if isinstance(__builtins__, dict) else getattr(__builtins__, k) for k in ("abs", "round")}
+    return eval(expr, {"__builtins__": None}, allowed_names)
+
+
+def _per_call(fn, number: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(number):
+        for e in EXPRESSIONS:
+            fn(e)
+    return (time.perf_counter() - t0) / (number * len(EXPRESSIONS))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=5000, help="passes over the expression set")
+    args = parser.parse_args()
+
+    same = all(math.isclose(calc(e), legacy_calc(e)) for e in EXPRESSIONS)
+    old_s, new_s = _per_call(legacy_calc, args.number), _per_call(calc, args.number)
+    print(f"expressions={len(EXPRESSIONS)} identical={same}")
+    print(f"legacy eval: {old_s*1e6:.2f} us/expr   compiled: {new_s*1e6:.2f} us/expr   speedup: {old_s/new_s:.2f}x")
+
+    accepted = []
+    for e in HOSTILE:
+        t0 = time.perf_counter()
+        try:
+            calc(e)
+            outcome = "ACCEPTED"
+            accepted.append(e)
+        except CalcError as err:
+            outcome = str(err)
+        print(f"  {(time.perf_counter()-t0)*1000:7.2f} ms  {e[:40]:<40}  {outcome}")
+    # hostile inputs must fail with the calculator's own error, never a result
+    sys.exit(1 if accepted else 0)
@@ -0,0 +1,92 @@
+"""Micro-benchmark: smart_chunk_text vs. the original quadratic chunker.
+
+    python benchmarks/chunking.py                     # synthetic 500-page document
+    python benchmarks/chunking.py --pdf paper.pdf     # a real PDF
+"""
+import os, sys, re, time, random, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_index import smart_chunk_text, read_text, CHUNK_SIZE, CHUNK_OVERLAP, MIN_CHUNK_SIZE
+
+
+def legacy_smart_chunk_text(text: str, source_path: str):
+    """The pre-rewrite implementation, kept verbatim for comparison"""
+    chunks = []
+    text = re.sub(r'\s+', ' ', text).strip()
+    sentences = re.split(r'[.!?]+', text)
+    sentences = [s.strip() for s in sentences if s.strip()]
+    if not sentences:
+        words = text.split()
+        sentences = []
+        for i in range(0, len(words), CHUNK_SIZE):
+            sentence = ' '.join(words[i:i+CHUNK_SIZE])
+            sentences.append(sentence)
+    current_chunk = ""
+    chunk_id = 0
+    for sentence in sentences:
+        sentence_words = sentence.split()
+        current_words = current_chunk.split()
+        if len(current_words) + len(sentence_words) > CHUNK_SIZE and current_chunk.strip():
+            if len(current_words) >= MIN_CHUNK_SIZE:
+                chunks.append((current_chunk.strip(), {
+                    "source": source_path,
+                    "chunk_id": chunk_id,
+                    "paragraph_count": 1,
+                    "word_count": len(current_words)
+                }))
+                chunk_id += 1
+            if len(current_words) > CHUNK_OVERLAP:
+                overlap_words = current_words[-CHUNK_OVERLAP:]
+                current_chunk = " ".join(overlap_words) + " " + sentence + " "
+            else:
+                current_chunk = sentence + " "
+        else:
+            current_chunk += sentence + ". "
+    if len(current_chunk.strip()) >= MIN_CHUNK_SIZE:
+        chunks.append((current_chunk.strip(), {
+            "source": source_path,
+            "chunk_id": chunk_id,
+            "paragraph_count": 1,
+            "word_count": len(current_chunk.split())
+        }))
+    return chunks
+
+
+def synthetic_document(pages: int = 500, words_per_page: int = 450, seed: int = 7) -> str:
+    rnd = random.Random(seed)
+    vocab = [
+        "model", "accuracy", "results", "the", "of", "data", "method", "evaluation", "patients",
+        "symptom", "prediction", "93.5%", "baseline", "we", "propose", "network", "training", "and",
+    ]
+    out = []
+    for _ in range(pages):
+        n = 0
+        while n < words_per_page:
+            k = rnd.choice([4, 9, 15, 22, 31, 60])
+            out.append(" ".join(rnd.choice(vocab) for _ in range(k)) + rnd.choice([". ", "! ", "? ", ".\n"]))
+            n += k
+        out.append("\n\n")
+    return "".join(out)
+
+
+def _time(fn, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(text, "bench")
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", help="PDF to chunk (default: synthetic 500-page text)")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    text = read_text(args.pdf) if args.pdf else synthetic_document(args.pages)
+    old_s, old = _time(legacy_smart_chunk_text, text, args.repeat)
+    new_s, new = _time(smart_chunk_text, text, args.repeat)
+    print(f"words={len(text.split())} chunks={len(new)} identical={old == new}")
+    print(f"legacy: {old_s*1000:.1f} ms   new: {new_s*1000:.1f} ms   speedup: {old_s/new_s:.2f}x")
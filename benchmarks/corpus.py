@@ -0,0 +1,79 @@
+"""Synthetic knowledge corpus for indexing and RAG benchmarks.
+
+    python benchmarks/corpus.py --out /tmp/knowledge --docs 200 --words 3000
+
+Writes markdown/text documents shaped like the papers and notes people put
+in ./knowledge: sections, numeric results ("accuracy of 93.5%"), and a
+distinctive fact per document. generate() also returns one query per
+document whose answer lives only in that document, so benchmarks can
+report retrieval hit rate alongside latency. Same seed, same corpus.
+"""
+import os, json, random, argparse
+
+TOPICS = [
+    ("medical diagnosis", ["patients", "symptoms", "clinical", "diagnosis", "hospital", "treatment"]),
+    ("fine tuning", ["gpu", "training", "lora", "parameters", "epochs", "memory"]),
+    ("retrieval", ["retrieval", "embeddings", "index", "recall", "queries", "ranking"]),
+    ("energy systems", ["solar", "grid", "battery", "demand", "forecast", "storage"]),
+    ("finance", ["portfolio", "returns", "volatility", "risk", "market", "assets"]),
+    ("robotics", ["robot", "control", "sensors", "navigation", "planning", "actuators"]),
+]
+COMMON = ("the of and a to in we is for that with on our this are by as results method "
+          "approach data model evaluation performance baseline proposed table figure").split()
+SECTIONS = ["Abstract", "Introduction", "Method", "Experiments", "Results", "Discussion", "Conclusion"]
+METRICS = ["accuracy", "f1 score", "precision", "recall", "throughput", "latency"]
+
+
+def _paragraph(rnd: random.Random, vocab: list, words: int) -> str:
+    out, n = [], 0
+    while n < words:
+        k = rnd.randint(8, 24)
+        out.append(" ".join(rnd.choice(vocab) if rnd.random() < 0.35 else rnd.choice(COMMON) for _ in range(k)).capitalize() + ".")
+        n += k
+    return " ".join(out)
+
+
+def document(i: int, words: int, seed: int = 7):
+    """(file name, text, {"query", "answer"}) for document i"""
+    rnd = random.Random(seed * 100003 + i)
+    topic, vocab = TOPICS[i % len(TOPICS)]
+    name = f"{topic.replace(' ', '_')}_{i:05d}"
+    metric = rnd.choice(METRICS)
+    value = f"{rnd.uniform(50, 99.9):.1f}%"
+    codename = f"project{rnd.choice(['alpha', 'nova', 'orion', 'delta', 'atlas', 'zephyr'])}{i}"
+    fact = f"The {codename} system reached a {metric} of {value} on the held-out {topic} benchmark."
+    per_section = max(40, words // len(SECTIONS))
+    parts = [f"# {codename}: a study of {topic}\n"]
+    fact_at = rnd.randrange(3, len(SECTIONS))
+    for s, title in enumerate(SECTIONS):
+        body = _paragraph(rnd, vocab, per_section)
+        if s == fact_at:
+            body = f"{body} {fact}"
+        parts.append(f"## {title}\n\n{body}\n")
+    ext = ".md" if i % 3 else ".txt"
+    return name + ext, "\n".join(parts), {"query": f"what {metric} did {codename} reach?", "answer": value, "doc": name + ext}
+
+
+def generate(out_dir: str, docs: int = 200, words: int = 3000, seed: int = 7) -> list[dict]:
+    """Write the corpus into out_dir; returns the per-document queries"""
+    os.makedirs(out_dir, exist_ok=True)
+    queries = []
+    for i in range(docs):
+        name, text, q = document(i, words, seed)
+        with open(os.path.join(out_dir, name), "w", encoding="utf-8") as f:
+            f.write(text)
+        queries.append(q)
+    return queries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", default="knowledge_bench")
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--words", type=int, default=3000, help="words per document")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    qs = generate(args.out, args.docs, args.words, args.seed)
+    with open(os.path.join(args.out, "queries.json"), "w", encoding="utf-8") as f:
+        json.dump(qs, f, indent=2)
+    print(f"wrote {args.docs} documents and queries.json to {args.out}")
@@ -0,0 +1,116 @@
+"""Offline stand-ins for the web: deterministic search results and article pages.
+
+    import fixtures
+    fixtures.install(latency=0.05)   # before the first web_search/news call
+
+install() swaps the network clients the tools use (DDGS, requests and the
+httpx async clients) for fakes inside tools.web_search and tools.news only,
+so searching, fetching, HTML cleaning and the HTTP cache all run for real
+against generated pages. Every URL always returns the same page, and the
+same query always returns the same results.
+"""
+import time, random, asyncio, zlib
+import httpx
+
+DOMAINS = ["reuters.com", "bbc.com", "thehindu.com", "ndtv.com", "example-blog.net", "indianexpress.com"]
+WORDS = (
+    "government announced new policy market shares rose percent quarter researchers found model "
+    "accuracy improved city council approved budget energy prices fell technology company launched "
+    "service users reported outage analysts expect growth election results showed turnout climate "
+    "report warned temperatures record rainfall"
+).split()
+
+
+def _rng(key: str) -> random.Random:
+    return random.Random(zlib.crc32(key.encode()))
+
+
+def _sentence(rnd: random.Random) -> str:
+    words = [rnd.choice(WORDS) for _ in range(rnd.randint(8, 20))]
+    return " ".join(words).capitalize() + "."
+
+
+def search_results(query: str, max_results: int = 5) -> list[dict]:
+    """DDGS-style rows ({title, href, body, source}) for query"""
+    rnd = _rng(query)
+    rows = []
+    for i in range(max_results):
+        domain = DOMAINS[(i + rnd.randrange(len(DOMAINS))) % len(DOMAINS)]
+        slug = "-".join(rnd.choice(WORDS) for _ in range(4))
+        rows.append({
+            "title": f"{query.title()}: {slug.replace('-', ' ')}",
+            "href": f"https://www.{domain}/{slug}-{rnd.randrange(10**6)}",
+            "body": _sentence(rnd),
+            "source": domain,
+        })
+    return rows
+
+
+def page_html(url: str, paragraphs: int = 12) -> str:
+    """An article-shaped HTML page (nav, article body, footer) for url"""
+    rnd = _rng(url)
+    body = "\n".join(f"<p>{' '.join(_sentence(rnd) for _ in range(4))}</p>" for _ in range(paragraphs))
+    return (
+        f"<html><head><title>{_sentence(rnd)}</title></head><body>"
+        "<nav><a href='/'>Home</a> <a href='/world'>World</a> <a href='/business'>Business</a></nav>"
+        f"<article><h1>{_sentence(rnd)}</h1>\n{body}</article>"
+        "<footer>Copyright. All rights reserved.</footer></body></html>"
+    )
+
+
+class FakeResponse:
+    def __init__(self, url: str, text: str, status_code: int = 200):
+        self.url = url
+        self.text = text
+        self.status_code = status_code
+        self.headers = {"ETag": f'"{zlib.crc32(text.encode()):x}"'}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code} for {self.url}")
+
+    def json(self):
+        return {"articles": []}
+
+
+def make_requests(latency: float):
+    """Stand-in for the requests module: get() sleeps latency and returns a generated page"""
+    class Requests:
+        @staticmethod
+        def get(url, timeout=None, headers=None, **kwargs):
+            time.sleep(latency)
+            return FakeResponse(url, page_html(url))
+    return Requests
+
+
+def make_ddgs(latency: float):
+    class DDGS:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def text(self, query, max_results=5, **kwargs):
+            time.sleep(latency)
+            return search_results(query, max_results)
+
+        news = text
+    return DDGS
+
+
+def make_async_client(latency: float) -> httpx.AsyncClient:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        html = page_html(str(request.url))
+        return httpx.Response(200, text=html, headers={"ETag": f'"{zlib.crc32(html.encode()):x}"'})
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=True)
+
+
+def install(latency: float = 0.05):
+    """Route tools.web_search and tools.news to the fakes; latency is seconds per search or fetch"""
+    from tools import news, web_search
+    for mod in (web_search, news):
+        mod.DDGS = make_ddgs(latency)
+        mod.requests = make_requests(latency)
+        mod._aclient = make_async_client(latency)
@@ -0,0 +1,92 @@
+"""Concurrent /ask load test.
+
+    # against a running server
+    python benchmarks/load_test.py --url http://127.0.0.1:8001 --concurrency 16
+
+    # self-contained: starts the mock LLM and the API server in a temp dir
+    python benchmarks/load_test.py --spawn --concurrency 1 4 16 --llm-latency 0.5
+
+With --spawn every /ask costs two mock LLM calls, so a server that overlaps
+I/O keeps throughput growing with concurrency while a blocking one stays
+flat at ~1 / (2 * latency) requests per second.
+"""
+import os, sys, json, time, asyncio, argparse, subprocess, tempfile, statistics
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+async def run_level(url: str, concurrency: int, total: int, prompt: str) -> dict:
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def client(http):
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            t0 = time.perf_counter()
+            try:
+                r = await http.post(f"{url}/ask", json={"prompt": prompt})
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+            except Exception:
+                errors += 1
+
+    async with httpx.AsyncClient(timeout=300) as http:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        wall = time.perf_counter() - t0
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else None
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "p50_s": pct(0.50),
+        "p95_s": pct(0.95),
+        "mean_s": statistics.mean(latencies) if latencies else None,
+    }
+
+
+def spawn(port: int, llm_port: int, llm_latency: float):
+    import mock_llm
+    mock_llm.serve(llm_port, llm_latency, background=True)
+    env = {**os.environ, "LLM_PROVIDER": "OLLAMA", "OLLAMA_BASE_URL": f"http://127.0.0.1:{llm_port}/v1"}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api_server:app", "--app-dir", ROOT, "--port", str(port), "--log-level", "warning"],
+        cwd=tempfile.mkdtemp(), env=env,
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/health", timeout=1)
+            return proc
+        except Exception:
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit("API server did not start")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8001")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32, help="requests per concurrency level")
+    parser.add_argument("--prompt", default="calc: 6*7")
+    parser.add_argument("--spawn", action="store_true", help="start mock LLM + API server locally")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--llm-port", type=int, default=8099)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    proc = spawn(args.port, args.llm_port, args.llm_latency) if args.spawn else None
+    url = f"http://127.0.0.1:{args.port}" if proc else args.url
+    try:
+        results = [asyncio.run(run_level(url, c, args.requests, args.prompt)) for c in args.concurrency]
+    finally:
+        if proc:
+            proc.terminate()
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,101 @@
+"""Minimal OpenAI-compatible chat completions server for offline benchmarks.
+
+    python benchmarks/mock_llm.py --port 8099 --latency 0.5
+    python benchmarks/mock_llm.py --latency 0.2 --token-rate 40 --answer-words 120
+
+Point the agent at it with LLM_PROVIDER=OLLAMA OLLAMA_BASE_URL=http://127.0.0.1:8099/v1.
+Planner requests (system prompt mentions the planning layer) get --plan back;
+every other request gets a canned answer (--answer-words long), streamed
+word by word as SSE when the request asks for "stream": true.
+
+Each completion takes --latency seconds plus one 1/--token-rate step per
+answer word (a word counts as one token), so generation cost scales with
+answer length like a real server. Responses carry a "usage" block. Output
+is deterministic: the same request always gets the same answer.
+"""
+import json, time, argparse, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PLAN = {"tool": "python_calc", "args": {"expr": "6*7"}, "thought": "mock plan"}
+FILLER = ("the results show that the proposed method improves accuracy over the baseline "
+          "on every benchmark while keeping latency low").split()
+
+
+def answer_text(words: int = 2) -> str:
+    if words <= 2:
+        return "Mock answer."
+    return "Mock answer: " + " ".join(FILLER[i % len(FILLER)] for i in range(words - 2)) + "."
+
+
+def make_handler(latency: float, plan: dict, token_delay: float = 0.0, answer_words: int = 2):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            msgs = body.get("messages", [])
+            system = msgs[0]["content"] if msgs and msgs[0].get("role") == "system" else ""
+            content = json.dumps(plan) if "planning layer" in system else answer_text(answer_words)
+            time.sleep(latency)
+            if body.get("stream"):
+                return self._stream(content)
+            completion = len(content.split(" "))
+            time.sleep(token_delay * completion)
+            prompt = sum(len(str(m.get("content", "")).split()) for m in msgs)
+            out = json.dumps({
+                "id": "mock", "object": "chat.completion", "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def _stream(self, content: str):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            pieces = [w + " " for w in content.split(" ")]
+            pieces[-1] = pieces[-1].rstrip()
+            for piece in pieces + [None]:
+                data = "[DONE]" if piece is None else json.dumps({"choices": [{"index": 0, "delta": {"content": piece}}]})
+                line = f"data: {data}\n\n".encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+                if piece is not None:
+                    time.sleep(token_delay)
+            self.wfile.write(b"0\r\n\r\n")
+
+    return Handler
+
+
+def serve(port: int = 8099, latency: float = 0.5, plan: dict = None, background: bool = False, token_delay: float = 0.0,
+          token_rate: float = 0.0, answer_words: int = 2):
+    """token_rate (tokens/s) overrides token_delay when set; port 0 picks a free port (see server.server_port)"""
+    if token_rate > 0:
+        token_delay = 1.0 / token_rate
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, plan or DEFAULT_PLAN, token_delay, answer_words))
+    server.daemon_threads = True
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per completion")
+    parser.add_argument("--plan", type=json.loads, default=DEFAULT_PLAN, help="JSON plan returned to the planner")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds per generated token")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="generated tokens per second (overrides --token-delay)")
+    parser.add_argument("--answer-words", type=int, default=2, help="length of non-planner answers")
+    args = parser.parse_args()
+    serve(args.port, args.latency, args.plan, token_delay=args.token_delay, token_rate=args.token_rate,
+          answer_words=args.answer_words)
@@ -0,0 +1,93 @@
+"""SQLite throughput: pooled WAL storage vs. the original connect-per-operation Memory.
+
+    python benchmarks/sqlite_storage.py --threads 1 4 16 --seconds 3
+
+Each worker thread loops over one agent turn's worth of database work:
+write the user+assistant messages, then read the planner history. Prints
+turns/s, messages written/s, history reads/s and "database is locked"
+errors per mode as JSON.
+"""
+import os, sys, json, time, sqlite3, argparse, tempfile, threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from memory import Memory
+
+
+class LegacyMemory:
+    """The pre-storage Memory: a fresh rollback-journal connection per operation"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE IF NOT EXISTS conv (id INTEGER PRIMARY KEY, role TEXT, content TEXT)")
+        conn.commit()
+        conn.close()
+
+    def add_conv(self, role: str, content: str):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO conv(role, content) VALUES (?,?)", (role, content))
+        conn.commit()
+        conn.close()
+
+    def last_k(self, k=10):
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("SELECT role, content FROM conv ORDER BY id DESC LIMIT ?", (k,)).fetchall()
+        conn.close()
+        return [{"role": r, "content": c} for (r, c) in rows[::-1]]
+
+
+def turn(mem, i: int):
+    if isinstance(mem, LegacyMemory):
+        mem.add_conv("user", f"question {i}")
+        mem.add_conv("assistant", f"answer {i} " * 20)
+    else:
+        mem.add_convs([("user", f"question {i}"), ("assistant", f"answer {i} " * 20)])
+    mem.last_k(24)
+
+
+def run(mem, threads: int, seconds: float) -> dict:
+    counts = {"turns": 0, "locked": 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def worker():
+        i = done = locked = 0
+        while time.perf_counter() < stop:
+            i += 1
+            try:
+                turn(mem, i)
+                done += 1
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                locked += 1
+        with lock:
+            counts["turns"] += done
+            counts["locked"] += locked
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return {
+        "turns_per_s": round(counts["turns"] / seconds, 1),
+        "messages_written_per_s": round(2 * counts["turns"] / seconds, 1),
+        "history_reads_per_s": round(counts["turns"] / seconds, 1),
+        "locked_errors": counts["locked"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    out = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, cls in (("legacy", LegacyMemory), ("pooled", Memory)):
+            for n in args.threads:
+                mem = cls(os.path.join(tmp, f"{name}-{n}.db"))
+                out.setdefault(name, {})[n] = run(mem, n, args.seconds)
+    print(json.dumps(out, indent=2))
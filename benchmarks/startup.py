@@ -0,0 +1,43 @@
+"""Startup cost: agent import time and first-request latency, cold vs. warmed up.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --prompt "ask rag: what are the results?"
+
+Each measurement runs in a fresh interpreter so module caches don't leak
+between runs. The first-request number includes the LLM calls, so point
+LLM_PROVIDER/OLLAMA_BASE_URL at the server you want to measure against.
+"""
+import os, sys, json, argparse, subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import time, json, sys, tempfile, os
+t0 = time.perf_counter()
+import agent
+t_import = time.perf_counter() - t0
+ag = agent.Agent(db_path=os.path.join(tempfile.mkdtemp(), "bench.db"))
+t_warm = 0.0
+if sys.argv[2] == "warm":
+    t1 = time.perf_counter()
+    agent.warmup(background=False)
+    t_warm = time.perf_counter() - t1
+t2 = time.perf_counter()
+ag.step(sys.argv[1])
+t_first = time.perf_counter() - t2
+print(json.dumps({"import_s": t_import, "warmup_s": t_warm, "first_request_s": t_first}))
+"""
+
+
+def measure(prompt: str, mode: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", PROBE, prompt, mode], cwd=ROOT, capture_output=True, text=True)
+    if out.returncode:
+        raise SystemExit(out.stderr)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prompt", default="ask rag: what are the main results?")
+    args = parser.parse_args()
+    print(json.dumps({mode: measure(args.prompt, mode) for mode in ("cold", "warm")}, indent=2))
@@ -0,0 +1,333 @@
+"""Offline benchmark suite: indexing, RAG latency, /ask under load, news, SQLite.
+
+    python benchmarks/suite.py --out run.json                  # every scenario
+    python benchmarks/suite.py --scenarios rag ask --docs 50   # a subset
+    python benchmarks/suite.py --compare base.json run.json    # ratios between two runs
+
+Everything runs in a temporary directory against local fakes, so it needs
+no network and no GPU:
+- the LLM is benchmarks/mock_llm.py (--llm-latency, --token-rate, --answer-words),
+- web search, news search and page fetches are benchmarks/fixtures.py,
+- ./knowledge is a generated corpus (benchmarks/corpus.py),
+- embeddings come from a hashing embedder unless --embedder model is
+  given (which needs the sentence-transformers model already on disk).
+
+Scenarios:
+- chunking: smart_chunk_text throughput over the corpus.
+- index: full rebuild, then a no-op incremental update.
+- rag: query latency percentiles and hit rate.
+- ask: end-to-end /ask through the FastAPI app at each --concurrency.
+- news: news_bundle, sync and async.
+- sqlite: conversation turns/s per thread count, notes search and task paging.
+
+Results are printed (and written to --out) as one JSON document. A
+scenario that fails records {"error": ...} and the rest still run.
+"""
+import os, re, sys, json, time, zlib, random, asyncio, argparse, platform, tempfile, subprocess, contextlib, traceback
+import numpy as np
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCH)
+
+SCENARIOS = ["chunking", "index", "rag", "ask", "news", "sqlite"]
+
+
+def percentiles(seconds: list) -> dict:
+    s = sorted(seconds)
+    if not s:
+        return {"n": 0}
+    pct = lambda p: round(s[min(len(s) - 1, int(p * len(s)))] * 1000, 3)
+    return {"n": len(s), "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99),
+            "mean_ms": round(sum(s) / len(s) * 1000, 3), "max_ms": round(s[-1] * 1000, 3)}
+
+
+class HashEmbedder:
+    """Deterministic bag-of-words feature hashing, standing in for the
+    sentence-transformers model (same encode() call shape)"""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts, batch_size: int = 64, convert_to_numpy: bool = True, **kwargs):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, t in enumerate(texts):
+            for w in re.findall(r"\w+", t.lower()):
+                h = zlib.crc32(w.encode())
+                out[i, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out
+
+
+def setup(args, workdir: str) -> dict:
+    """Point every path and backend at workdir and the fakes; must run before repo modules are imported"""
+    import mock_llm, corpus
+    os.chdir(workdir)
+    knowledge = os.path.join(workdir, "knowledge")
+    queries = corpus.generate(knowledge, args.docs, args.words, args.seed)
+    llm = mock_llm.serve(0, args.llm_latency, background=True, token_rate=args.token_rate, answer_words=args.answer_words)
+    os.environ.update({
+        "KNOWLEDGE_DIR": knowledge,
+        "CHROMA_DIR": os.path.join(workdir, ".chroma"),
+        "HTTP_CACHE_PATH": os.path.join(workdir, ".cache", "http_cache.sqlite3"),
+        "LLM_PROVIDER": "OLLAMA",
+        "OLLAMA_BASE_URL": f"http://127.0.0.1:{llm.server_port}/v1",
+        "JARVIS_WARMUP": "false",
+        "TRACE_LOG": "",
+        "VECTOR_BACKEND": args.vector_backend,
+    })
+    if args.embedder == "hash":
+        import embeddings
+        embeddings._model = HashEmbedder()
+    return {"queries": queries, "knowledge": knowledge}
+
+
+# -------- scenarios --------
+
+def bench_chunking(args, env):
+    from rag_index import load_texts, smart_chunk_text
+    texts = load_texts(env["knowledge"])
+    words = sum(len(t.split()) for _, t in texts)
+    t0 = time.perf_counter()
+    chunks = sum(len(smart_chunk_text(t, p)) for p, t in texts)
+    secs = time.perf_counter() - t0
+    return {"docs": len(texts), "words": words, "chunks": chunks, "seconds": round(secs, 3),
+            "words_per_s": round(words / secs), "chunks_per_s": round(chunks / secs)}
+
+
+def bench_index(args, env):
+    import rag_index
+    t0 = time.perf_counter()
+    rag_index.rebuild()
+    rebuild = time.perf_counter() - t0
+    chunks = sum(len(e.get("chunks", [])) for e in rag_index.load_manifest()["files"].values())
+    t0 = time.perf_counter()
+    rag_index.update()
+    noop = time.perf_counter() - t0
+    return {"docs": args.docs, "chunks": chunks, "rebuild_s": round(rebuild, 3),
+            "docs_per_s": round(args.docs / rebuild, 2), "chunks_per_s": round(chunks / rebuild, 1),
+            "noop_update_s": round(noop, 3)}
+
+
+def bench_rag(args, env):
+    from tools import rag
+    qs = env["queries"][:args.queries]
+    rag.query(qs[0]["query"])  # load the store and lexical index outside the timings
+    times, hits = [], 0
+    for q in qs:
+        t0 = time.perf_counter()
+        res = rag.query(q["query"], k=4)
+        times.append(time.perf_counter() - t0)
+        hits += any(os.path.basename(m.get("source", "")) == q["doc"] for _, m in res)
+    t0 = time.perf_counter()
+    rag.query_batch([q["query"] for q in qs], k=4)
+    batch = time.perf_counter() - t0
+    return {"mode": rag.RAG_MODE, **percentiles(times), "hit_rate_at_4": round(hits / len(qs), 3),
+            "batch_queries_per_s": round(len(qs) / batch, 1)}
+
+
+def ask_prompts(env) -> list[str]:
+    qs = env["queries"]
+    return [
+        "calc: 2**10 + 17*3",
+        "note: benchmark note about the quarterly budget",
+        "search notes: budget",
+        "add task: review benchmark results",
+        "list tasks",
+        f"ask rag: {qs[0]['query']}",
+        f"ask rag: {qs[len(qs) // 2]['query']}",
+        "web: what is retrieval augmented generation",
+        "news: energy prices",
+    ]
+
+
+async def _ask_level(client, prompts: list, concurrency: int, total: int, sessions: int) -> dict:
+    latencies, errors = [], 0
+    todo = list(range(total))
+
+    async def worker():
+        nonlocal errors
+        while todo:
+            i = todo.pop()
+            t0 = time.perf_counter()
+            try:
+                r = await client.post("/ask", json={"prompt": prompts[i % len(prompts)], "session_id": f"bench{i % sessions}"})
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+            except Exception:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    return {"concurrency": concurrency, "requests": total, "errors": errors,
+            "throughput_rps": round(len(latencies) / wall, 2), **percentiles(latencies)}
+
+
+def bench_ask(args, env):
+    import httpx, fixtures
+    fixtures.install(args.web_latency)
+    import api_server
+    prompts = ask_prompts(env)
+
+    async def run():
+        transport = httpx.ASGITransport(app=api_server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            await _ask_level(client, prompts, 1, len(prompts), 1)  # warm every path once
+            return [await _ask_level(client, prompts, c, args.requests, args.sessions) for c in args.concurrency]
+
+    return {"prompts": prompts, "levels": asyncio.run(run())}
+
+
+def bench_news(args, env):
+    import fixtures
+    fixtures.install(args.web_latency)
+    from tools import news
+    from llm_client import LLMClient
+    llm = LLMClient()
+    topics = ["energy prices", "election results", "technology outage", "climate report"]
+    sync, asyn = [], []
+    for t in topics:
+        t0 = time.perf_counter()
+        news.news_bundle(t, llm_call=llm.chat)
+        sync.append(time.perf_counter() - t0)
+
+    async def run():
+        for t in topics:
+            t0 = time.perf_counter()
+            await news.anews_bundle(t + " today", allm_call=llm.achat)
+            asyn.append(time.perf_counter() - t0)
+
+    asyncio.run(run())
+    return {"sync": percentiles(sync), "async": percentiles(asyn)}
+
+
+def bench_sqlite(args, env):
+    import sqlite_storage
+    from memory import Memory
+    from storage import get_db
+    from tools import notes, tasks
+    out = {"memory": {}}
+    for n in (1, 4, 16):
+        out["memory"][n] = sqlite_storage.run(Memory(f"sqlite-{n}.db", "bench"), n, args.sqlite_seconds)
+
+    rnd = random.Random(args.seed)
+    db = get_db("sqlite-tools.db")
+    words = "buy call send review plan book fix write read pay groceries report invoice meeting budget draft".split()
+    batches = max(1, args.rows // 1000)  # of 100 rows, per session
+    with db.connection() as conn:
+        for s in range(10):
+            sid = f"user{s}"
+            for _ in range(batches):
+                with conn:
+                    for _ in range(100):
+                        conn.execute("INSERT INTO notes(session_id, text) VALUES (?,?)", (sid, " ".join(rnd.choices(words, k=8))))
+                tasks.add_many(conn, [{"text": " ".join(rnd.choices(words, k=5)), "priority": rnd.randrange(4),
+                                       "tags": rnd.sample(["work", "home", "urgent"], 1)} for _ in range(100)], sid)
+        find, page = [], []
+        for i in range(200):
+            sid = f"user{i % 10}"
+            t0 = time.perf_counter()
+            notes.find(conn, " ".join(rnd.choices(words, k=2)), session_id=sid)
+            find.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            res = tasks.list_tasks(conn, session_id=sid)
+            res = tasks.list_tasks(conn, cursor=res["next"], session_id=sid) if res["next"] else res
+            page.append(time.perf_counter() - t0)
+    out["rows_per_table"] = 10 * batches * 100
+    out["notes_find"] = percentiles(find)
+    out["task_two_pages"] = percentiles(page)
+    return out
+
+
+BENCHES = {"chunking": bench_chunking, "index": bench_index, "rag": bench_rag,
+           "ask": bench_ask, "news": bench_news, "sqlite": bench_sqlite}
+
+
+# -------- runs --------
+
+def meta() -> dict:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        rev = ""
+    return {"git": rev, "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def run(args) -> dict:
+    out = {"meta": meta(), "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")}, "results": {}}
+    with tempfile.TemporaryDirectory(prefix="jarvis-bench-") as workdir:
+        cwd = os.getcwd()
+        try:
+            env = setup(args, workdir)
+            # scenario code prints progress; keep stdout for the JSON
+            with contextlib.redirect_stdout(sys.stderr):
+                if {"rag", "ask"} & set(args.scenarios) and "index" not in args.scenarios:
+                    # rag and ask query the index; build it untimed
+                    bench_index(args, env)
+                for name in sorted(args.scenarios, key=SCENARIOS.index):
+                    print(f"[bench] {name}...", file=sys.stderr)
+                    try:
+                        out["results"][name] = BENCHES[name](args, env)
+                    except Exception as e:
+                        traceback.print_exc()
+                        out["results"][name] = {"error": f"{type(e).__name__}: {e}"}
+        finally:
+            os.chdir(cwd)
+    return out
+
+
+def _flatten(d, prefix=""):
+    for k, v in d.items():
+        if isinstance(v, dict):
+            yield from _flatten(v, f"{prefix}{k}.")
+        elif isinstance(v, list) and v and isinstance(v[0], dict):
+            for i, item in enumerate(v):
+                yield from _flatten(item, f"{prefix}{k}[{item.get('concurrency', i)}].")
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            yield prefix + k, v
+
+
+def compare(base_path: str, new_path: str) -> dict:
+    """{metric: {base, new, ratio}} for every numeric result both runs share"""
+    with open(base_path) as f:
+        base = dict(_flatten(json.load(f)["results"]))
+    with open(new_path) as f:
+        new = dict(_flatten(json.load(f)["results"]))
+    return {k: {"base": base[k], "new": new[k], "ratio": round(new[k] / base[k], 3) if base[k] else None}
+            for k in base if k in new}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--out", help="also write the results JSON here")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two result files and exit")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--docs", type=int, default=100, help="corpus documents")
+    parser.add_argument("--words", type=int, default=2000, help="words per document")
+    parser.add_argument("--queries", type=int, default=100, help="RAG queries timed")
+    parser.add_argument("--embedder", choices=["hash", "model"], default="hash")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=64, help="/ask requests per concurrency level")
+    parser.add_argument("--sessions", type=int, default=8, help="sessions the /ask requests are spread over")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="mock LLM seconds per completion")
+    parser.add_argument("--token-rate", type=float, default=400.0, help="mock LLM tokens per second")
+    parser.add_argument("--answer-words", type=int, default=60, help="mock LLM answer length")
+    parser.add_argument("--web-latency", type=float, default=0.02, help="fake search/fetch seconds")
+    parser.add_argument("--sqlite-seconds", type=float, default=1.0)
+    parser.add_argument("--rows", type=int, default=20000, help="notes and tasks (each) in the sqlite scenario, over 10 sessions")
+    parser.add_argument("--vector-backend", choices=["chroma", "local"], default=os.getenv("VECTOR_BACKEND", "chroma"))
+    args = parser.parse_args()
+
+    if args.compare:
+        print(json.dumps(compare(*args.compare), indent=2))
+        sys.exit(0)
+    result = run(args)
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    print(text)
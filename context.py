@@ -0,0 +1,142 @@
+import os, re, json
+from functools import lru_cache
+
+CONTEXT_TOKENS = int(os.getenv("CONTEXT_TOKENS", "4096"))  # model context window
+CONTEXT_REPLY_TOKENS = int(os.getenv("CONTEXT_REPLY_TOKENS", "512"))  # kept free for the completion
+CONTEXT_HISTORY_TOKENS = int(os.getenv("CONTEXT_HISTORY_TOKENS", "1200"))
+CONTEXT_OBSERVATION_TOKENS = int(os.getenv("CONTEXT_OBSERVATION_TOKENS", "1500"))
+CONTEXT_PAGE_TOKENS = int(os.getenv("CONTEXT_PAGE_TOKENS", "300"))  # fetched page text kept per web_search
+CONTEXT_HISTORY_MESSAGES = int(os.getenv("CONTEXT_HISTORY_MESSAGES", "24"))  # newest messages considered
+
+# Approximates BPE tokenizers: words split into pieces of up to 4 characters,
+# every punctuation mark its own token. Within ~15% of llama/gpt tokenizers
+# on English prose and JSON, and needs no model files.
+_TOKEN = re.compile(r"\w{1,4}|[^\w\s]")
+MESSAGE_OVERHEAD = 4  # role and separator tokens per chat message
+ELLIPSIS = "..."
+
+
+def _count(text: str) -> int:
+    return len(_TOKEN.findall(text))
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """Approximate token count; cached since history messages recur every turn"""
+    return _count(text)
+
+
+def message_tokens(messages: list[dict]) -> int:
+    return sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD for m in messages)
+
+
+def truncate_text(text: str, budget: int) -> str:
+    """text cut to about budget tokens, at a word boundary"""
+    if budget <= 0:
+        return ""
+    tokens = list(_TOKEN.finditer(text))
+    if len(tokens) <= budget:
+        return text
+    end = tokens[max(budget - _count(ELLIPSIS), 1) - 1].end()
+    cut = text[:end]
+    space = cut.rfind(" ")
+    if space > end // 2:
+        cut = cut[:space]
+    return cut.rstrip() + ELLIPSIS
+
+
+def history_budget(*fixed: str) -> int:
+    """Tokens left for history once the fixed parts and the reply are reserved"""
+    used = sum(count_tokens(t) + MESSAGE_OVERHEAD for t in fixed if t)
+    return max(0, min(CONTEXT_HISTORY_TOKENS, CONTEXT_TOKENS - CONTEXT_REPLY_TOKENS - used))
+
+
+def fit_history(history: list[dict], budget: int) -> list[dict]:
+    """Newest messages that fit budget, whole, in chronological order.
+
+    Older turns are dropped; a newest message that alone exceeds the budget
+    is truncated rather than dropped.
+    """
+    kept, used = [], 0
+    for m in reversed(history):
+        size = count_tokens(m["content"]) + MESSAGE_OVERHEAD
+        if used + size > budget:
+            if not kept and budget > MESSAGE_OVERHEAD:
+                kept.append({**m, "content": truncate_text(m["content"], budget - MESSAGE_OVERHEAD)})
+            break
+        kept.append(m)
+        used += size
+    return kept[::-1]
+
+
+def _size(obj) -> int:
+    return _count(json.dumps(obj))
+
+
+def _fair_cap(sizes: list[int], avail: int) -> int:
+    """Largest per-field cap c with sum(min(size, c)) <= avail; sizes ascending"""
+    for i, size in enumerate(sizes):
+        share = avail // (len(sizes) - i)
+        if size > share:
+            return max(share, 0)
+        avail -= size
+    return sizes[-1] if sizes else 0
+
+
+def trim_observation(obs, budget: int = CONTEXT_OBSERVATION_TOKENS):
+    """obs shrunk to about budget tokens of JSON without breaking its structure.
+
+    Lists (search results, chunks, articles are ranked best first) lose
+    trailing items, dicts and tuples (records such as a chunk's (text, source))
+    give their large fields equal shares, and strings are cut at a word
+    boundary, so the result always serializes to valid JSON.
+    """
+    if _size(obs) <= budget:
+        return obs
+    if isinstance(obs, str):
+        return truncate_text(obs, budget - 2)
+    if isinstance(obs, list):
+        out, used = [], 2
+        for item in obs:
+            size = _size(item) + 1
+            if used + size > budget:
+                if not out:
+                    out.append(trim_observation(item, budget - used))
+                break
+            out.append(item)
+            used += size
+        return out
+    if isinstance(obs, tuple):
+        sizes = [_size(v) for v in obs]
+        avail = budget - (_size(obs) - sum(sizes))
+        cap = _fair_cap(sorted(sizes), avail)
+        return tuple(trim_observation(v, cap) if size > cap else v for v, size in zip(obs, sizes))
+    if isinstance(obs, dict):
+        # water-filling: small fields stay whole, large ones share what is left equally
+        sizes = {k: _size(v) for k, v in obs.items()}
+        avail = budget - (_size(obs) - sum(sizes.values()))
+        cap = _fair_cap(sorted(sizes.values()), avail)
+        return {k: trim_observation(v, cap) if sizes[k] > cap else v for k, v in obs.items()}
+    return obs
+
+
+def trim_observations(observations: list[dict], budget: int = CONTEXT_OBSERVATION_TOKENS) -> list[dict]:
+    """A turn's {tool, args, observation} records shrunk to about budget tokens.
+
+    Unlike a ranked list, each record is a different source, so none is
+    dropped: small records stay whole and large ones share the rest equally.
+    """
+    if _size(observations) <= budget:
+        return observations
+    sizes = [_size(o) for o in observations]
+    avail = budget - (_size(observations) - sum(sizes))
+    cap = _fair_cap(sorted(sizes), avail)
+    return [trim_observation(o, cap) if size > cap else o for o, size in zip(observations, sizes)]
+
+
+def observation_json(obs, budget: int = CONTEXT_OBSERVATION_TOKENS) -> str:
+    return json.dumps(trim_observation(obs, budget))
+
+
+def observations_json(observations: list[dict], budget: int = CONTEXT_OBSERVATION_TOKENS) -> str:
+    return json.dumps(trim_observations(observations, budget))
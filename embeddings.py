@@ -0,0 +1,152 @@
+import os, sqlite3, hashlib, threading, time
+from typing import List
+import numpy as np
+from metrics import timed
+
+
+EMBED = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+CHROMA_DIR = os.getenv("CHROMA_DIR", ".chroma")
+EMBED_CACHE = os.getenv("EMBED_CACHE", "true").lower() == "true"
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(CHROMA_DIR, "embed_cache.sqlite3"))
+EMBED_CACHE_MAX = int(os.getenv("EMBED_CACHE_MAX", "200000"))  # entries
+
+
+_model = None
+_cache = None
+_lock = threading.Lock()
+
+
+def get_model():
+    """Shared SentenceTransformer instance (loaded on first use)"""
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBED)
+    return _model
+
+
+def text_hash(text: str) -> str:
+    """Hash of whitespace-normalized text, used as the cache key"""
+    return hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """On-disk embedding cache keyed by (model name, text hash).
+
+    Vectors are stored as float32 BLOBs in SQLite. Every lookup refreshes the
+    entry's last-used time, and once the table grows past max_entries the
+    least recently used tenth is evicted.
+    """
+
+    def __init__(self, path: str = EMBED_CACHE_PATH, model_name: str = EMBED, max_entries: int = EMBED_CACHE_MAX):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (model TEXT, h TEXT, dim INTEGER, vec BLOB, used REAL, "
+            "PRIMARY KEY (model, h)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_used ON embeddings(used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, hashes: List[str]) -> dict:
+        found = {}
+        if not hashes:
+            return found
+        with self._lock:
+            uniq = list(dict.fromkeys(hashes))
+            for i in range(0, len(uniq), 500):
+                part = uniq[i:i+500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT h, dim, vec FROM embeddings WHERE model=? AND h IN ({marks})", [self.model_name, *part]
+                ).fetchall()
+                for h, dim, vec in rows:
+                    found[h] = np.frombuffer(vec, dtype=np.float32, count=dim)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET used=? WHERE model=? AND h=?", [(now, self.model_name, h) for h in found]
+                )
+                self._conn.commit()
+            hit = sum(1 for h in hashes if h in found)
+            self.hits += hit
+            self.misses += len(hashes) - hit
+        return found
+
+    def put_many(self, items: dict):
+        if not items:
+            return
+        now = time.time()
+        rows = [
+            (self.model_name, h, int(v.shape[0]), np.asarray(v, dtype=np.float32).tobytes(), now)
+            for h, v in items.items()
+        ]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT OR IGNORE INTO embeddings(model, h, dim, vec, used) VALUES (?,?,?,?,?)", rows)
+            self._count += self._conn.total_changes - before
+            if self._count > self.max_entries:
+                drop = self._count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE (model, h) IN (SELECT model, h FROM embeddings ORDER BY used LIMIT ?)",
+                    (drop,),
+                )
+                self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": self._count,
+            "max_entries": self.max_entries,
+        }
+
+
+def get_cache():
+    global _cache
+    if _cache is None and EMBED_CACHE:
+        with _lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
+
+
+@timed("embed")
+def encode(texts: List[str], batch_size: int = 64) -> np.ndarray:
+    """Embed texts as a float32 matrix, going to the model only for cache misses"""
+    cache = get_cache()
+    if cache is None:
+        return np.asarray(get_model().encode(texts, batch_size=batch_size, convert_to_numpy=True), dtype=np.float32)
+
+    hashes = [text_hash(t) for t in texts]
+    found = cache.get_many(hashes)
+    todo = {}
+    for h, t in zip(hashes, texts):
+        if h not in found and h not in todo:
+            todo[h] = t
+    if todo:
+        vecs = get_model().encode(list(todo.values()), batch_size=batch_size, convert_to_numpy=True)
+        fresh = {h: np.asarray(v, dtype=np.float32) for h, v in zip(todo, vecs)}
+        cache.put_many(fresh)
+        found.update(fresh)
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.stack([found[h] for h in hashes])
+
+
+def stats() -> dict:
+    """Embedding cache hit/miss counters"""
+    cache = get_cache()
+    return cache.stats() if cache else {"enabled": False}
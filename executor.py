@@ -0,0 +1,25 @@
+import os, asyncio, functools, threading
+from metrics import bound
+from concurrent.futures import ThreadPoolExecutor
+
+
+EXECUTOR_WORKERS = int(os.getenv("EXECUTOR_WORKERS", "8"))
+
+_pool = None
+_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Bounded pool for blocking work (SQLite, embedding, HTML cleaning, sync clients)"""
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix="jarvis")
+    return _pool
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking callable on the shared pool without stalling the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), bound(functools.partial(fn, *args, **kwargs)))
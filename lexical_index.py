@@ -0,0 +1,111 @@
+import os, re, json, sqlite3, threading
+from typing import List, Tuple
+
+
+CHROMA_DIR = os.getenv("CHROMA_DIR", ".chroma")
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", os.path.join(CHROMA_DIR, "lexical.sqlite3"))
+
+EVAL_TERMS = ["accuracy", "precision", "recall", "f1", "performance", "results", "evaluation"]
+METHOD_TERMS = ["method", "approach", "algorithm", "technique", "methodology"]
+
+_WORD = re.compile(r"\w+")
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (rid INTEGER PRIMARY KEY, cid TEXT UNIQUE, text TEXT, meta TEXT);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+    text, content='chunks', content_rowid='rid', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+    INSERT INTO chunks_fts(rowid, text) VALUES (new.rid, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+    INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES ('delete', old.rid, old.text);
+END;
+"""
+
+_index = None
+_lock = threading.Lock()
+
+
+def chunk_features(text: str) -> dict:
+    """Query-independent ranking features, computed once at index time"""
+    lower = text.lower()
+    return {
+        "has_pct": bool(re.search(r'\d+%', text)),
+        "eval_terms": sum(1 for t in EVAL_TERMS if t in lower),
+        "method_terms": sum(1 for t in METHOD_TERMS if t in lower),
+    }
+
+
+def match_expr(query: str, max_terms: int = 32) -> str:
+    """FTS5 MATCH expression: any of the query's words"""
+    terms = list(dict.fromkeys(_WORD.findall(query.lower())))[:max_terms]
+    return " OR ".join(f'"{t}"' for t in terms)
+
+
+class LexicalIndex:
+    """BM25 inverted index over RAG chunks (SQLite FTS5).
+
+    Lives next to the vector store and is kept in sync by rag_index, keyed by
+    the same chunk ids.
+    """
+
+    def __init__(self, path: str = LEXICAL_INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[dict]):
+        with self._lock:
+            self._delete(ids)
+            self._conn.executemany(
+                "INSERT INTO chunks(cid, text, meta) VALUES (?,?,?)",
+                [(i, d, json.dumps(m)) for i, d, m in zip(ids, documents, metadatas)],
+            )
+            self._conn.commit()
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            self._delete(ids)
+            self._conn.commit()
+
+    def _delete(self, ids):
+        self._conn.executemany("DELETE FROM chunks WHERE cid=?", [(i,) for i in ids])
+
+    def reset(self):
+        with self._lock:
+            self._conn.executescript("DROP TABLE IF EXISTS chunks_fts; DROP TABLE IF EXISTS chunks;" + _SCHEMA)
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def is_empty(self) -> bool:
+        """Cheap emptiness check for the query path (count() scans the table)"""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM chunks LIMIT 1").fetchone() is None
+
+    def search(self, query: str, n: int = 20) -> List[Tuple[str, float, str, dict]]:
+        """Top-n (chunk id, bm25 score, text, metadata), best first"""
+        expr = match_expr(query)
+        if not expr:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.cid, -bm25(chunks_fts) AS score, c.text, c.meta FROM chunks_fts "
+                "JOIN chunks c ON c.rid = chunks_fts.rowid WHERE chunks_fts MATCH ? ORDER BY score DESC LIMIT ?",
+                (expr, n),
+            ).fetchall()
+        return [(cid, score, text, json.loads(meta)) for cid, score, text, meta in rows]
+
+
+def get_index() -> LexicalIndex:
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = LexicalIndex()
+    return _index
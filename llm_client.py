@@ -1,9 +1,32 @@
-import os, json, requests
+import os, json, time, random, asyncio, threading
+import httpx
 from typing import Dict, Any
 from dotenv import load_dotenv
+from context import count_tokens, message_tokens
+from metrics import count, span
 
 load_dotenv()
 
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "10"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "0.5"))  # base seconds, doubled per attempt
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def _http2_available(base: str) -> bool:
+    # HTTP/2 needs TLS (no h2c in httpx) and the optional h2 package
+    if not (LLM_HTTP2 and base.startswith("https://")):
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
 
 class LLMClient:
     def __init__(self):
@@ -18,13 +41,222 @@ class LLMClient:
         else: # OLLAMA
             self.base = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1")
             self.key = None
+        self.http2 = _http2_available(self.base)
+        self._client = None
+        self._aclient = None
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "errors": 0, "new_connections": 0, "latency_s_total": 0.0, "latency_s_max": 0.0}
 
-    def chat(self, messages: list[Dict[str, str]], temperature: float = 0.2) -> str:
-        url = f"{self.base}/chat/completions"
+    # -------- pooled clients --------
+
+    def _client_kwargs(self) -> dict:
         headers = {"Content-Type": "application/json"}
         if self.key:
             headers["Authorization"] = f"Bearer {self.key}"
+        return {
+            "base_url": self.base,
+            "headers": headers,
+            "http2": self.http2,
+            "limits": httpx.Limits(max_connections=LLM_POOL_SIZE, max_keepalive_connections=LLM_POOL_SIZE),
+            "timeout": httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        }
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(**self._client_kwargs())
+        return self._client
+
+    @property
+    def aclient(self) -> httpx.AsyncClient:
+        if self._aclient is None:
+            with self._lock:
+                if self._aclient is None:
+                    self._aclient = httpx.AsyncClient(**self._client_kwargs())
+        return self._aclient
+
+    def _detach(self):
+        with self._lock:
+            client, aclient = self._client, self._aclient
+            self._client = self._aclient = None
+        return client, aclient
+
+    def close(self):
+        """Close both pools; use aclose() from inside a running event loop"""
+        client, aclient = self._detach()
+        if client is not None:
+            client.close()
+        if aclient is not None:
+            asyncio.run(aclient.aclose())
+
+    async def aclose(self):
+        client, aclient = self._detach()
+        if client is not None:
+            client.close()
+        if aclient is not None:
+            await aclient.aclose()
+
+    # -------- metrics --------
+
+    def _count(self, key: str, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _trace(self, event: str, info: dict):
+        # httpcore only emits connect_tcp for connections it has to open
+        if event == "connection.connect_tcp.complete":
+            self._count("new_connections")
+
+    async def _atrace(self, event: str, info: dict):
+        self._trace(event, info)
+
+    def _observe(self, seconds: float):
+        with self._lock:
+            self._stats["latency_s_total"] += seconds
+            self._stats["latency_s_max"] = max(self._stats["latency_s_max"], seconds)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Request, retry and connection-reuse counters plus latency"""
+        with self._lock:
+            s = dict(self._stats)
+        done = s["requests"] - s["errors"]
+        s["reused_connections"] = max(0, s["requests"] + s["retries"] - s["new_connections"])
+        s["latency_s_avg"] = s["latency_s_total"] / done if done > 0 else 0.0
+        s["http2"] = self.http2
+        return s
+
+    # -------- chat --------
+
+    def _body(self, messages: list[Dict[str, str]], temperature: float, stream: bool = False) -> bytes:
         body = {"model": self.model, "messages": messages, "temperature": temperature}
-        r = requests.post(url, headers=headers, data=json.dumps(body), timeout=90)
+        if stream:
+            body["stream"] = True
+        return json.dumps(body).encode()
+
+    def _timeout(self, timeout):
+        return httpx.Timeout(timeout, connect=LLM_CONNECT_TIMEOUT) if timeout else httpx.USE_CLIENT_DEFAULT
+
+    @staticmethod
+    def _backoff(attempt: int, response=None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), 30.0)
+        # full jitter
+        return random.uniform(0, LLM_BACKOFF * (2 ** attempt))
+
+    @staticmethod
+    def _tokens(sp, messages: list[Dict[str, str]], usage: dict, text: str):
+        """Record prompt/completion token counts: the server's usage if it sent one, else an estimate"""
+        estimated = "prompt_tokens" not in usage
+        prompt = message_tokens(messages) if estimated else usage["prompt_tokens"]
+        completion = count_tokens(text) if estimated else usage.get("completion_tokens", 0)
+        count("jarvis_llm_tokens", prompt, kind="prompt")
+        count("jarvis_llm_tokens", completion, kind="completion")
+        sp.set(prompt_tokens=prompt, completion_tokens=completion, estimated=estimated)
+
+    def _content(self, r: httpx.Response, sp, messages: list[Dict[str, str]]) -> str:
         r.raise_for_status()
-        return r.json()["choices"][0]["message"]["content"].strip()
+        data = r.json()
+        text = data["choices"][0]["message"]["content"].strip()
+        self._tokens(sp, messages, data.get("usage") or {}, text)
+        return text
+
+    def chat(self, messages: list[Dict[str, str]], temperature: float = 0.2, timeout: float = None) -> str:
+        """Blocking chat over the pooled keep-alive client.
+
+        429/5xx and transport errors are retried up to LLM_MAX_RETRIES times
+        with jittered exponential backoff. timeout overrides the read timeout
+        for this call.
+        """
+        with span("llm", op="chat") as sp:
+            self._count("requests")
+            t0 = time.perf_counter()
+            for attempt in range(LLM_MAX_RETRIES + 1):
+                r = None
+                try:
+                    r = self.client.post("/chat/completions", content=self._body(messages, temperature),
+                                         timeout=self._timeout(timeout), extensions={"trace": self._trace})
+                    if r.status_code not in RETRY_STATUS or attempt == LLM_MAX_RETRIES:
+                        out = self._content(r, sp, messages)
+                        self._observe(time.perf_counter() - t0)
+                        return out
+                except httpx.TransportError:
+                    if attempt == LLM_MAX_RETRIES:
+                        self._count("errors")
+                        raise
+                except Exception:
+                    self._count("errors")
+                    raise
+                self._count("retries")
+                time.sleep(self._backoff(attempt, r))
+
+    async def achat(self, messages: list[Dict[str, str]], temperature: float = 0.2, timeout: float = None) -> str:
+        """Non-blocking chat for the async agent path (same pooling and retries)"""
+        with span("llm", op="chat") as sp:
+            self._count("requests")
+            t0 = time.perf_counter()
+            for attempt in range(LLM_MAX_RETRIES + 1):
+                r = None
+                try:
+                    r = await self.aclient.post("/chat/completions", content=self._body(messages, temperature),
+                                                timeout=self._timeout(timeout), extensions={"trace": self._atrace})
+                    if r.status_code not in RETRY_STATUS or attempt == LLM_MAX_RETRIES:
+                        out = self._content(r, sp, messages)
+                        self._observe(time.perf_counter() - t0)
+                        return out
+                except httpx.TransportError:
+                    if attempt == LLM_MAX_RETRIES:
+                        self._count("errors")
+                        raise
+                except Exception:
+                    self._count("errors")
+                    raise
+                self._count("retries")
+                await asyncio.sleep(self._backoff(attempt, r))
+
+    def chat_stream(self, messages: list[Dict[str, str]], temperature: float = 0.2, timeout: float = None):
+        """Yield completion text deltas as the server streams them (OpenAI-style SSE).
+
+        Retries only happen before the first byte of a response; once tokens
+        are flowing, errors propagate to the caller.
+        """
+        with span("llm", op="stream") as sp:
+            self._count("requests")
+            t0 = time.perf_counter()
+            started = False
+            parts = []
+            for attempt in range(LLM_MAX_RETRIES + 1):
+                try:
+                    with self.client.stream("POST", "/chat/completions", content=self._body(messages, temperature, stream=True),
+                                            timeout=self._timeout(timeout), extensions={"trace": self._trace}) as r:
+                        if r.status_code in RETRY_STATUS and attempt < LLM_MAX_RETRIES:
+                            delay = self._backoff(attempt, r)
+                        else:
+                            r.raise_for_status()
+                            for line in r.iter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line[5:].strip()
+                                if data == "[DONE]":
+                                    break
+                                choices = json.loads(data).get("choices") or [{}]
+                                delta = (choices[0].get("delta") or {}).get("content")
+                                if delta:
+                                    started = True
+                                    parts.append(delta)
+                                    yield delta
+                            self._tokens(sp, messages, {}, "".join(parts))
+                            self._observe(time.perf_counter() - t0)
+                            return
+                except httpx.TransportError:
+                    if started or attempt == LLM_MAX_RETRIES:
+                        self._count("errors")
+                        raise
+                    delay = self._backoff(attempt)
+                except Exception:
+                    self._count("errors")
+                    raise
+                self._count("retries")
+                time.sleep(delay)
@@ -1,17 +1,27 @@
-from agent import Agent
+import sys
+from agent import Agent, WARMUP, warmup
 from rich import print
 
 
 def run():
     ag = Agent(db_path="jarvis.db")
+    if WARMUP:
+        warmup()
     print("[bold green]Jarvis‑Lite v0.1[/] — type 'exit' to quit")
     while True:
         q = input("\nYou: ")
         if q.strip().lower() in {"exit","quit"}: 
             break
         try:
-            a = ag.step(q)
-            print(f"\n[cyan]Agent:[/] {a}")
+            print("\n[cyan]Agent:[/] ", end="")
+            for ev in ag.step_stream(q):
+                if ev["type"] == "tool":
+                    print(f"[dim]({ev['tool']}…)[/] ", end="")
+                elif ev["type"] == "token":
+                    # plain write: tokens may contain [brackets] rich would parse as markup
+                    sys.stdout.write(ev["text"])
+                    sys.stdout.flush()
+            print()
         except Exception as e:
             print(f"[red]Error:[/] {e}")
 
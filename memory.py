@@ -1,48 +1,58 @@
-import os, json, sqlite3
+import json
+from storage import DEFAULT_SESSION, get_db
 
 
 class Memory:
-    def __init__(self, db_path: str):
-        self.db_path = db_path
-        self._migrate()
+    """One session's conversation and long-term memory.
+
+    Sessions share the pooled database; every read and write is scoped to
+    session_id, so Memory objects are cheap to create per request.
+    """
 
-    def _get_connection(self):
-        return sqlite3.connect(self.db_path)
+    def __init__(self, db_path: str, session_id: str = DEFAULT_SESSION):
+        self.db_path = db_path
+        self.session_id = session_id
+        # schema is migrated once, when the shared pool is first opened
+        self.db = get_db(db_path)
 
-    def _migrate(self):
-        conn = self._get_connection()
-        cur = conn.cursor()
-        cur.execute("CREATE TABLE IF NOT EXISTS long_memory (k TEXT PRIMARY KEY, v TEXT)")
-        cur.execute("CREATE TABLE IF NOT EXISTS conv (id INTEGER PRIMARY KEY, role TEXT, content TEXT)")
-        conn.commit()
-        conn.close()
+    def _key(self, key: str) -> str:
+        # the default session keeps the unprefixed keys written before sessions existed
+        return key if self.session_id == DEFAULT_SESSION else f"{self.session_id}:{key}"
 
     def add_conv(self, role: str, content: str):
-        conn = self._get_connection()
-        conn.execute("INSERT INTO conv(role, content) VALUES (?,?)", (role, content))
-        conn.commit()
-        conn.close()
-
-    def last_k(self, k=10):
-        conn = self._get_connection()
-        cur = conn.execute("SELECT role, content FROM conv ORDER BY id DESC LIMIT ?", (k,))
-        rows = cur.fetchall()
-        conn.close()
-        # Fix: Handle empty result set to prevent "list index out of range"
-        if not rows:
-            return []
+        self.add_convs([(role, content)])
+
+    def add_convs(self, messages: list[tuple[str, str]]):
+        """Append (role, content) messages in one transaction"""
+        with self.db.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO conv(session_id, role, content) VALUES (?,?,?)",
+                [(self.session_id, r, c) for r, c in messages],
+            )
+
+    def last_k(self, k=10, after_id=0):
+        """Newest k messages, oldest first; after_id skips turns already summarized"""
+        with self.db.connection() as conn:
+            rows = conn.execute(
+                "SELECT role, content FROM conv WHERE session_id = ? AND id > ? ORDER BY id DESC LIMIT ?",
+                (self.session_id, after_id, k),
+            ).fetchall()
         rows = rows[::-1]  # Reverse to get chronological order
-        return [{"role": r, "content": c} for (r,c) in rows]
+        return [{"role": r, "content": c} for (r, c) in rows]
+
+    def conv_after(self, after_id: int, limit: int = -1):
+        """(id, role, content) rows newer than after_id, oldest first"""
+        with self.db.connection() as conn:
+            return conn.execute(
+                "SELECT id, role, content FROM conv WHERE session_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (self.session_id, after_id, limit),
+            ).fetchall()
 
     def set(self, key: str, value: dict):
-        conn = self._get_connection()
-        conn.execute("REPLACE INTO long_memory(k,v) VALUES (?,?)", (key, json.dumps(value)))
-        conn.commit()
-        conn.close()
+        with self.db.transaction() as conn:
+            conn.execute("REPLACE INTO long_memory(k,v) VALUES (?,?)", (self._key(key), json.dumps(value)))
 
     def get(self, key: str, default=None):
-        conn = self._get_connection()
-        cur = conn.execute("SELECT v FROM long_memory WHERE k=?", (key,))
-        row = cur.fetchone()
-        conn.close()
+        with self.db.connection() as conn:
+            row = conn.execute("SELECT v FROM long_memory WHERE k=?", (self._key(key),)).fetchone()
         return json.loads(row[0]) if row else default
@@ -0,0 +1,213 @@
+import os, json, time, functools, inspect, threading
+from bisect import bisect_left
+from contextvars import ContextVar, copy_context
+
+METRICS = os.getenv("METRICS", "true").lower() == "true"  # latency histograms for /metrics
+TRACE_LOG = os.getenv("TRACE_LOG", "")  # JSONL file every traced request is appended to ("" = off)
+
+# seconds; covers SQLite ops (sub-ms) up to slow LLM calls
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_histograms = {}  # labels tuple -> [count per bucket..., overflow, sum, count]
+_counters = {}  # (name, labels tuple) -> value
+_trace = ContextVar("jarvis_trace", default=None)
+_log_lock = threading.Lock()
+
+
+def observe(seconds: float, labels: tuple):
+    """Record one span duration in the jarvis_span_seconds histogram"""
+    with _lock:
+        h = _histograms.get(labels)
+        if h is None:
+            h = _histograms[labels] = [0] * (len(BUCKETS) + 3)
+        h[bisect_left(BUCKETS, seconds)] += 1  # index len(BUCKETS) is the +Inf overflow
+        h[-2] += seconds
+        h[-1] += 1
+
+
+def count(name: str, value: float = 1, **labels):
+    """Add value to counter name (rendered as name_total)"""
+    if not METRICS:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+class _Span:
+    __slots__ = ("labels", "attrs", "t0", "trace")
+
+    def __init__(self, labels: tuple, trace):
+        self.labels = labels
+        self.attrs = None
+        self.trace = trace
+
+    def set(self, **attrs):
+        """Attach values (token counts, sizes...) to this span in the request trace"""
+        if self.attrs is None:
+            self.attrs = attrs
+        else:
+            self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.t0
+        if METRICS:
+            observe(seconds, self.labels)
+        if self.trace is not None:
+            rec = dict(self.labels)
+            rec["start_ms"] = round((self.t0 - self.trace["t0"]) * 1000, 2)
+            rec["ms"] = round(seconds * 1000, 2)
+            if self.attrs:
+                rec.update(self.attrs)
+            if exc[0] is not None:
+                rec["error"] = exc[0].__name__
+            self.trace["spans"].append(rec)
+        return False
+
+
+class _NoSpan:
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoSpan()
+
+
+def span(name: str, **labels):
+    """Time a stage: `with span("tool", tool="web_search") as s: ...`.
+
+    Labels become histogram labels, so keep them low-cardinality. When
+    metrics are off and no trace is active this returns a shared no-op.
+    """
+    trace = _trace.get()
+    if not METRICS and trace is None:
+        return _NOOP
+    return _Span((("span", name), *labels.items()), trace)
+
+
+def timed(name: str, **labels):
+    """Decorator: run every call of a function (sync or async) inside span(name)"""
+    def wrap(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def ainner(*args, **kwargs):
+                with span(name, **labels):
+                    return await fn(*args, **kwargs)
+            return ainner
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(name, **labels):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def bound(fn):
+    """fn wrapped to run in a copy of the current context, so spans it records
+    from a pool thread still land in the caller's trace"""
+    return functools.partial(copy_context().run, fn)
+
+
+class trace:
+    """Collect the spans of one request: `with trace(**info) as t: ...; t["spans"]`.
+
+    Spans are gathered from this context and from work it hands to threads
+    with contextvars.copy_context(). On exit the trace is appended to
+    TRACE_LOG when that is set.
+    """
+
+    def __init__(self, **info):
+        self.data = {"ts": time.time(), **info, "spans": []}
+        self._token = None
+
+    def __enter__(self) -> dict:
+        self.data["t0"] = time.perf_counter()
+        self._token = _trace.set(self.data)
+        return self.data
+
+    def __exit__(self, *exc):
+        _trace.reset(self._token)
+        self.data["ms"] = round((time.perf_counter() - self.data.pop("t0")) * 1000, 2)
+        if TRACE_LOG:
+            line = json.dumps(self.data, default=str)
+            with _log_lock, open(TRACE_LOG, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        return False
+
+
+def tracing() -> bool:
+    """True when requests should be traced regardless of the caller asking"""
+    return bool(TRACE_LOG)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs) -> str:
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    with _lock:
+        hists = {k: list(v) for k, v in _histograms.items()}
+        counters = dict(_counters)
+    out = [
+        "# HELP jarvis_span_seconds Latency of agent stages (plan, tool, llm, fetch, embed, vector_query, sqlite).",
+        "# TYPE jarvis_span_seconds histogram",
+    ]
+    for labels, h in sorted(hists.items()):
+        lab = _labels(labels)
+        acc = 0
+        for b, n in zip(BUCKETS, h):
+            acc += n
+            out.append(f'jarvis_span_seconds_bucket{{{lab},le="{b}"}} {acc}')
+        out.append(f'jarvis_span_seconds_bucket{{{lab},le="+Inf"}} {h[-1]}')
+        out.append(f"jarvis_span_seconds_sum{{{lab}}} {h[-2]:.6f}")
+        out.append(f"jarvis_span_seconds_count{{{lab}}} {h[-1]}")
+    seen = set()
+    for (name, labels), value in sorted(counters.items()):
+        if name not in seen:
+            seen.add(name)
+            out.append(f"# TYPE {name}_total counter")
+        out.append(f"{name}_total{{{_labels(labels)}}} {value}" if labels else f"{name}_total {value}")
+    return "\n".join(out) + "\n"
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def summarize(path: str) -> dict:
+    """Per-span count, p50, p95 and max (ms) over a TRACE_LOG file"""
+    samples = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            for sp in json.loads(line)["spans"]:
+                key = sp["span"] + "".join(f":{sp[k]}" for k in ("tool", "op") if k in sp)
+                samples.setdefault(key, []).append(sp["ms"])
+    out = {}
+    for key, ms in sorted(samples.items()):
+        ms.sort()
+        out[key] = {"count": len(ms), "p50": ms[len(ms) // 2], "p95": ms[min(len(ms) - 1, int(len(ms) * 0.95))], "max": ms[-1]}
+    return out
+
+
+if __name__ == "__main__":
+    import sys
+    print(json.dumps(summarize(sys.argv[1] if len(sys.argv) > 1 else TRACE_LOG), indent=2))
@@ -1,21 +1,50 @@
 import json
+from context import fit_history, history_budget, observations_json
 SYSTEM = (
 "You are a planning layer. Decide the NEXT ACTION as JSON. "
 "Allowed tools: news_query, web_search, notes_add, notes_find, task_add, task_list, task_done, rag_query, python_calc, final. "
-"Return strictly JSON: {\"tool\": str, \"args\": {..}, \"thought\": str}. If finished, use tool=final with answer."
+"Return strictly JSON: {\"tool\": str, \"args\": {..}, \"thought\": str}. If finished, use tool=final with answer. "
+"task_add takes text and optional due (YYYY-MM-DD), priority (0-3) and tags, or items for several tasks; "
+"task_list takes optional min_priority, tag, due_before and cursor (the previous page's next); task_done takes id or ids. "
+"To run several independent tools at once, return {\"calls\": [{\"tool\": str, \"args\": {..}}, ..], \"thought\": str}."
 )
+SUMMARY = "Summary of the earlier conversation: {summary}"
+FOLLOWUP = "Observations so far: {obs}\nDecide the next action. Use tool=final once the observations answer the question."
 
 
-def build_messages(history: list[dict], user_input: str):
+def build_messages(history: list[dict], user_input: str, observations: list[dict] = None, summary: str = None):
+    """Planner prompt; history is cut to the newest turns that fit the token budget.
+
+    summary (the rolling summary of turns older than history) goes right
+    after the system prompt.
+    """
+    followup = FOLLOWUP.format(obs=observations_json(observations)) if observations else None
+    summary = SUMMARY.format(summary=summary) if summary else None
     msgs = [{"role": "system", "content": SYSTEM}]
-    msgs += history
+    if summary:
+        msgs.append({"role": "system", "content": summary})
+    msgs += fit_history(history, history_budget(SYSTEM, summary, user_input, followup))
     msgs.append({"role": "user", "content": user_input})
+    if followup:
+        msgs.append({"role": "user", "content": followup})
     return msgs
 
 
+def plan_calls(plan: dict) -> list[dict]:
+    """Tool calls in a plan, excluding final: its "calls" list, or its single tool"""
+    calls = plan.get("calls")
+    if not isinstance(calls, list):
+        calls = [plan]
+    return [
+        {"tool": c["tool"], "args": c.get("args") or {}}
+        for c in calls if isinstance(c, dict) and c.get("tool") and c["tool"] != "final"
+    ]
+
+
 def parse_plan(text: str) -> dict:
     try:
-        return json.loads(text)
+        plan = json.loads(text)
+        return {"calls": plan, "thought": ""} if isinstance(plan, list) else plan
     except Exception:
         # Improved fallback: check for RAG intent
         text_lower = text.lower()
@@ -1,138 +1,384 @@
-import os, argparse, chromadb
-from sentence_transformers import SentenceTransformer
+import os, argparse, json, hashlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from embeddings import encode, stats as embed_stats
+from lexical_index import chunk_features, get_index as get_lexical
+from vector_store import get_store
 from pypdf import PdfReader
 import re
 from typing import List, Tuple
 
 
-EMBED = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 CHROMA_DIR = os.getenv("CHROMA_DIR", ".chroma")
+KNOWLEDGE_DIR = os.getenv("KNOWLEDGE_DIR", "knowledge")
+MANIFEST_PATH = os.getenv("INDEX_MANIFEST", os.path.join(CHROMA_DIR, "index_manifest.json"))
 
 # Enhanced chunking parameters
 CHUNK_SIZE = 200  # tokens per chunk (smaller for better granularity)
 CHUNK_OVERLAP = 50  # tokens overlap between chunks
 MIN_CHUNK_SIZE = 30  # minimum chunk size
+CHUNK_BY_TOKENS = os.getenv("CHUNK_BY_TOKENS", "false").lower() == "true"  # size chunks with the embedder's tokenizer
 
+# Ingestion pipeline defaults
+INDEX_WORKERS = int(os.getenv("INDEX_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "256"))  # chunks per embed/upsert call
 
-model = SentenceTransformer(EMBED)
-client = chromadb.PersistentClient(path=CHROMA_DIR)
-col = client.get_or_create_collection("jarvis_knowledge")
 
+_SENTENCE = re.compile(r'[^.!?]+')
 
-def smart_chunk_text(text: str, source_path: str) -> List[Tuple[str, dict]]:
-    """Enhanced chunking with overlap and semantic boundaries"""
+
+def _token_counter():
+    """Per-word wordpiece counts from the embedding model's tokenizer.
+
+    WordPiece pre-tokenizes on whitespace and punctuation, so summing per-word
+    counts gives the same length the model sees for the joined chunk.
+    """
+    from embeddings import get_model
+    model = get_model()
+    tok = model.tokenizer
+    limit = min(CHUNK_SIZE, (getattr(model, "max_seq_length", None) or CHUNK_SIZE + 2) - 2)
+    cache = {}
+
+    def count(words):
+        new = [w for w in dict.fromkeys(words) if w not in cache]
+        if new:
+            for w, ids in zip(new, tok(new, add_special_tokens=False)["input_ids"]):
+                cache[w] = len(ids)
+        return [cache[w] for w in words]
+
+    return count, limit
+
+
+def smart_chunk_text(text: str, source_path: str, by_tokens: bool = CHUNK_BY_TOKENS) -> List[Tuple[str, dict]]:
+    """Enhanced chunking with overlap and semantic boundaries
+
+    Single pass over sentence spans keeping running word (or token) counts.
+    With by_tokens, sizes are measured with the embedder's tokenizer and
+    chunks are capped at the model's max sequence length, so nothing gets
+    truncated at embed time.
+    """
     chunks = []
     
     # Clean text but preserve some structure
     text = re.sub(r'\s+', ' ', text).strip()
     
     # Try to split by sentences first, then by word count
-    sentences = re.split(r'[.!?]+', text)
-    sentences = [s.strip() for s in sentences if s.strip()]
+    sentences = [m.group().split() for m in _SENTENCE.finditer(text)]
+    sentences = [s for s in sentences if s]
     
     if not sentences:
         # Fallback: split by words if no sentences found
         words = text.split()
-        sentences = []
-        for i in range(0, len(words), CHUNK_SIZE):
-            sentence = ' '.join(words[i:i+CHUNK_SIZE])
-            sentences.append(sentence)
+        sentences = [words[i:i+CHUNK_SIZE] for i in range(0, len(words), CHUNK_SIZE)]
+    
+    if by_tokens:
+        count, limit = _token_counter()
+        period = 1  # the "." appended after a sentence is its own wordpiece
+    else:
+        count, limit = (lambda words: [1] * len(words)), CHUNK_SIZE
+        period = 0
     
-    current_chunk = ""
-    chunk_id = 0
+    def emit(words, weights):
+        meta = {
+            "source": source_path,
+            "chunk_id": len(chunks),
+            "paragraph_count": 1,
+            "word_count": len(words)
+        }
+        if by_tokens:
+            meta["token_count"] = sum(weights)
+        chunks.append((" ".join(words), meta))
+    
+    cur, cur_w, total = [], [], 0
     
     for sentence in sentences:
-        sentence_words = sentence.split()
-        current_words = current_chunk.split()
+        weights = count(sentence)
+        pieces = [(sentence, weights)]
+        if by_tokens and sum(weights) > limit:
+            # Oversized sentence: cut it into pieces that fit the model
+            pieces, start, run = [], 0, 0
+            for i, w in enumerate(weights):
+                if run + w > limit and i > start:
+                    pieces.append((sentence[start:i], weights[start:i]))
+                    start, run = i, 0
+                run += w
+            pieces.append((sentence[start:], weights[start:]))
         
-        # If adding this sentence exceeds chunk size, save current chunk
-        if len(current_words) + len(sentence_words) > CHUNK_SIZE and current_chunk.strip():
-            if len(current_words) >= MIN_CHUNK_SIZE:
-                chunks.append((current_chunk.strip(), {
-                    "source": source_path,
-                    "chunk_id": chunk_id,
-                    "paragraph_count": 1,
-                    "word_count": len(current_words)
-                }))
-                chunk_id += 1
-            
-            # Start new chunk with overlap
-            if len(current_words) > CHUNK_OVERLAP:
-                overlap_words = current_words[-CHUNK_OVERLAP:]
-                current_chunk = " ".join(overlap_words) + " " + sentence + " "
+        for words, weights in pieces:
+            size = sum(weights)
+            # If adding this sentence exceeds chunk size, save current chunk
+            if total + size + period > limit and cur:
+                if total >= MIN_CHUNK_SIZE:
+                    emit(cur, cur_w)
+                
+                # Start new chunk with overlap
+                keep = CHUNK_OVERLAP
+                if by_tokens:
+                    keep, run = 0, 0
+                    budget = min(CHUNK_OVERLAP, limit - size)
+                    while keep < len(cur_w) and run + cur_w[-1 - keep] <= budget:
+                        run += cur_w[-1 - keep]
+                        keep += 1
+                if keep and len(cur) > keep:
+                    cur, cur_w = cur[-keep:] + words, cur_w[-keep:] + weights
+                else:
+                    cur, cur_w = list(words), list(weights)
+                total = sum(cur_w)
             else:
-                current_chunk = sentence + " "
-        else:
-            # Add sentence to current chunk
-            current_chunk += sentence + ". "
+                # Add sentence to current chunk
+                cur.extend(words)
+                cur_w.extend(weights)
+                cur[-1] += "."
+                cur_w[-1] += period
+                total += size + period
     
     # Don't forget the last chunk
-    if len(current_chunk.strip()) >= MIN_CHUNK_SIZE:
-        chunks.append((current_chunk.strip(), {
-            "source": source_path,
-            "chunk_id": chunk_id,
-            "paragraph_count": 1,
-            "word_count": len(current_chunk.split())
-        }))
+    if len(" ".join(cur)) >= MIN_CHUNK_SIZE:
+        emit(cur, cur_w)
     
     return chunks
 
 
-
-
-def load_texts(root="knowledge"):
-    docs = []
+def iter_files(root=KNOWLEDGE_DIR):
+    """Yield every indexable file path under root"""
     for dirpath,_,files in os.walk(root):
         for f in files:
-            p = os.path.join(dirpath,f)
-            if f.lower().endswith(".pdf"):
-                txt = "\n\n".join(page.extract_text() or "" for page in PdfReader(p).pages)
-            elif f.lower().endswith((".md",".txt")):
-                txt = open(p, "r", encoding="utf-8", errors="ignore").read()
-            else:
+            if f.lower().endswith((".pdf",".md",".txt")):
+                yield os.path.join(dirpath,f)
+
+
+def read_text(p: str) -> str:
+    if p.lower().endswith(".pdf"):
+        return "\n\n".join(page.extract_text() or "" for page in PdfReader(p).pages)
+    with open(p, "r", encoding="utf-8", errors="ignore") as fh:
+        return fh.read()
+
+
+def load_texts(root=KNOWLEDGE_DIR):
+    return [(p, read_text(p)) for p in iter_files(root)]
+
+
+# -------- Manifest (incremental indexing) --------
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(p: str) -> str:
+    h = hashlib.sha256()
+    with open(p, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_manifest() -> dict:
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {"version": 1, "files": {}}
+
+
+def save_manifest(manifest: dict):
+    os.makedirs(os.path.dirname(MANIFEST_PATH) or ".", exist_ok=True)
+    tmp = MANIFEST_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh)
+    os.replace(tmp, MANIFEST_PATH)
+
+
+def _manifest_entry(p: str, digest: str, chunk_rows: list) -> dict:
+    st = os.stat(p)
+    return {"mtime": st.st_mtime, "size": st.st_size, "sha256": digest, "chunks": chunk_rows}
+
+
+# -------- Streaming ingestion pipeline --------
+
+def _extract(p: str, known_digest: str = None):
+    """Worker-side stage: hash the file and extract its text.
+
+    Text is skipped (None) when the content hash matches known_digest.
+    """
+    digest = file_hash(p)
+    if digest == known_digest:
+        return p, digest, None
+    return p, digest, read_text(p)
+
+
+def _extract_stream(jobs, workers: int):
+    """Yield (path, digest, text) for (path, known_digest) jobs as they finish.
+
+    At most 2 * workers files are in flight, so extraction can never run far
+    ahead of chunking and embedding.
+    """
+    if workers <= 1:
+        for p, known in jobs:
+            yield _extract(p, known)
+        return
+    jobs = iter(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for p, known in jobs:
+            pending.add(pool.submit(_extract, p, known))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                nxt = next(jobs, None)
+                if nxt is not None:
+                    pending.add(pool.submit(_extract, *nxt))
+                yield fut.result()
+
+
+class _Batcher:
+    """Buffers chunks and embeds + upserts them batch_size at a time"""
+
+    def __init__(self, batch_size: int):
+        self.batch_size = batch_size
+        self.chunks = 0
+        self._ids, self._docs, self._metas, self._embs = [], [], [], []
+
+    def add(self, cid: str, text: str, meta: dict, emb=None):
+        self._ids.append(cid)
+        self._docs.append(text)
+        self._metas.append(meta)
+        self._embs.append(emb)
+        if len(self._ids) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._ids:
+            return
+        missing = [i for i, e in enumerate(self._embs) if e is None]
+        if missing:
+            for i, e in zip(missing, encode([self._docs[i] for i in missing])):
+                self._embs[i] = e.tolist()
+        get_store().upsert(ids=self._ids, documents=self._docs, metadatas=self._metas, embeddings=self._embs)
+        get_lexical().upsert(self._ids, self._docs, self._metas)
+        self.chunks += len(self._ids)
+        self._ids, self._docs, self._metas, self._embs = [], [], [], []
+
+
+def _index_document(p: str, text: str, batcher: _Batcher, old_entry: dict = None) -> list:
+    """Chunk one document and queue its chunks on the batcher.
+
+    Chunks whose text hash already appears in the document's previous manifest
+    entry reuse the stored embedding instead of going through the model.
+    Returns the [chunk id, chunk hash] rows for the manifest.
+    """
+    chunks = smart_chunk_text(text, p)
+    hashes = [_sha256(t.encode("utf-8")) for t, _ in chunks]
+    old_chunks = (old_entry or {}).get("chunks", [])
+    old_by_hash = {h: cid for cid, h in old_chunks}
+
+    reuse = {}
+    if old_chunks:
+        col = get_store()
+        wanted = [old_by_hash[h] for h in hashes if h in old_by_hash]
+        if wanted:
+            got = col.get(ids=wanted, include=["embeddings"])
+            reuse = {cid: list(e) for cid, e in zip(got["ids"], got["embeddings"])}
+        col.delete(ids=[cid for cid, _ in old_chunks])
+        get_lexical().delete([cid for cid, _ in old_chunks])
+
+    rows = []
+    for (t, meta), h in zip(chunks, hashes):
+        cid = f"{p}_{meta['chunk_id']}"
+        meta.update(chunk_features(t))
+        batcher.add(cid, t, meta, reuse.get(old_by_hash.get(h)))
+        rows.append([cid, h])
+    return rows
+
+
+def _optimize():
+    # Compaction / IVF training for the local backend; Chroma manages itself
+    store = get_store()
+    if hasattr(store, "optimize"):
+        store.optimize()
+
+
+def update(workers: int = INDEX_WORKERS, batch_size: int = INDEX_BATCH_SIZE):
+    """Incrementally sync the collection with ./knowledge.
+
+    Unchanged files (same mtime and size, or same content hash) are skipped,
+    new and modified files are re-chunked and re-embedded, and chunks of
+    deleted files are removed from the collection.
+    """
+    manifest = load_manifest()
+    files = manifest.setdefault("files", {})
+    stats = {"added": 0, "updated": 0, "removed": 0, "skipped": 0}
+    seen = set()
+
+    def jobs():
+        for p in iter_files():
+            seen.add(p)
+            st = os.stat(p)
+            entry = files.get(p)
+            if entry and entry["mtime"] == st.st_mtime and entry["size"] == st.st_size:
+                stats["skipped"] += 1
                 continue
-            docs.append((p, txt))
-    return docs
+            yield p, (entry or {}).get("sha256")
 
+    batcher = _Batcher(batch_size)
+    for p, digest, text in _extract_stream(jobs(), workers):
+        entry = files.get(p)
+        if text is None:
+            # touched but not modified
+            st = os.stat(p)
+            entry["mtime"], entry["size"] = st.st_mtime, st.st_size
+            stats["skipped"] += 1
+            continue
+        rows = _index_document(p, text, batcher, entry)
+        files[p] = _manifest_entry(p, digest, rows)
+        stats["updated" if entry else "added"] += 1
+    batcher.flush()
 
+    for p in [p for p in files if p not in seen]:
+        ids = [cid for cid, _ in files[p].get("chunks", [])]
+        if ids:
+            get_store().delete(ids=ids)
+            get_lexical().delete(ids)
+        del files[p]
+        stats["removed"] += 1
 
+    _optimize()
+    save_manifest(manifest)
+    print("Incremental index: {added} added, {updated} updated, {removed} removed, {skipped} skipped".format(**stats))
+    print(f"Embedding cache: {embed_stats()}")
+    return stats
 
-def rebuild():
-    docs = load_texts()
-    if not docs:
+
+def rebuild(workers: int = INDEX_WORKERS, batch_size: int = INDEX_BATCH_SIZE):
+    paths = list(iter_files())
+    if not paths:
         print("No docs found in ./knowledge")
         return
     # Clear all existing documents
-    try:
-        col.delete()
-    except:
-        # If collection doesn't exist or is empty, recreate it
-        pass
-    
-    # Use smart chunking
-    all_chunks = []
-    all_ids = []
-    all_metas = []
-    
-    for doc_path, doc_text in docs:
-        chunks = smart_chunk_text(doc_text, doc_path)
-        for chunk_text, chunk_meta in chunks:
-            all_chunks.append(chunk_text)
-            all_ids.append(f"{doc_path}_{chunk_meta['chunk_id']}")
-            all_metas.append(chunk_meta)
-    
-    # Create embeddings for all chunks
-    print(f"Creating embeddings for {len(all_chunks)} chunks...")
-    embs = model.encode(all_chunks, convert_to_numpy=True)
-    
-    # Add to ChromaDB
-    col.add(ids=all_ids, documents=all_chunks, metadatas=all_metas, embeddings=embs)
-    print(f"Indexed {len(docs)} documents into {len(all_chunks)} chunks")
+    get_store(reset=True)
+    get_lexical().reset()
+
+    manifest = {"version": 1, "files": {}}
+    batcher = _Batcher(batch_size)
+    for doc_path, digest, doc_text in _extract_stream(((p, None) for p in paths), workers):
+        rows = _index_document(doc_path, doc_text, batcher)
+        manifest["files"][doc_path] = _manifest_entry(doc_path, digest, rows)
+    batcher.flush()
+
+    _optimize()
+    save_manifest(manifest)
+    print(f"Indexed {len(paths)} documents into {batcher.chunks} chunks")
+    print(f"Embedding cache: {embed_stats()}")
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--rebuild", action="store_true")
+    parser.add_argument("--incremental", action="store_true", help="only re-index new/changed files and drop deleted ones")
+    parser.add_argument("--workers", type=int, default=INDEX_WORKERS, help="text extraction processes")
+    parser.add_argument("--batch-size", type=int, default=INDEX_BATCH_SIZE, help="chunks per embed/upsert batch")
     args = parser.parse_args()
     if args.rebuild:
-        rebuild()
+        rebuild(args.workers, args.batch_size)
+    elif args.incremental:
+        update(args.workers, args.batch_size)
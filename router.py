@@ -0,0 +1,92 @@
+import os, re
+
+ROUTER = os.getenv("ROUTER", "true").lower() == "true"
+ROUTER_SKIP_REFLECT = os.getenv("ROUTER_SKIP_REFLECT", "true").lower() == "true"
+
+# Tools whose observation is already the answer; formatted locally instead of
+# a reflect call when the turn was routed
+TRIVIAL_TOOLS = {"python_calc", "task_list", "task_add", "task_done", "notes_add", "notes_find"}
+
+# (prefix, tool, arg name), longest prefixes first so "add task:" wins over "task:"
+PREFIXES = [
+    ("search notes:", "notes_find", "query"),
+    ("find note:", "notes_find", "query"),
+    ("add note:", "notes_add", "text"),
+    ("add task:", "task_add", "text"),
+    ("ask rag:", "rag_query", "query"),
+    ("news:", "news_query", "query"),
+    ("note:", "notes_add", "text"),
+    ("task:", "task_add", "text"),
+    ("calc:", "python_calc", "expr"),
+    ("web:", "web_search", "query"),
+    ("rag:", "rag_query", "query"),
+]
+
+_ARITHMETIC = re.compile(r"^[\d\s.+\-*/%^()]+$")
+_OPERATOR = re.compile(r"\d\s*(\*\*|[+\-*/%^])\s*[\d(]")
+# dates, phone numbers and ids that look like sums: 2024-10-18, 555-1234, 18/10/2024, (555) 123 4567
+_NOT_ARITHMETIC = re.compile(r"^[\d()]+(?:-[\d()]+)+$|\d/\d+/\d|\d\s+\d|\)\s*\d")
+_LIST_TASKS = re.compile(r"^(list|show)( my| open)? tasks$|^tasks$")
+_DONE = re.compile(r"^(?:mark )?(?:task )?(?:done|complete|finish)(?: task)? #?(\d+)$|^(?:mark )?(?:task )?#?(\d+) (?:as )?done$")
+
+
+def route(user_input: str):
+    """Plan for an unambiguous prompt without asking the LLM, or None.
+
+    Returns the same {"tool", "args", "thought"} shape as parse_plan.
+    """
+    text = user_input.strip()
+    lower = text.lower()
+    for prefix, tool, arg in PREFIXES:
+        if lower.startswith(prefix):
+            value = text[len(prefix):].strip()
+            if not value:
+                return None
+            return {"tool": tool, "args": {arg: value}, "thought": f"routed by prefix {prefix!r}"}
+    norm = " ".join(lower.rstrip("?.!").split())
+    if _LIST_TASKS.match(norm):
+        return {"tool": "task_list", "args": {}, "thought": "routed: list tasks"}
+    m = _DONE.match(norm)
+    if m:
+        return {"tool": "task_done", "args": {"id": int(m.group(1) or m.group(2))}, "thought": "routed: task done"}
+    expr = text.rstrip("=? ")
+    if _ARITHMETIC.match(expr) and _OPERATOR.search(expr) and not _NOT_ARITHMETIC.search(expr):
+        return {"tool": "python_calc", "args": {"expr": expr}, "thought": "routed: arithmetic"}
+    return None
+
+
+def skip_reflect(tool: str) -> bool:
+    return ROUTER_SKIP_REFLECT and tool in TRIVIAL_TOOLS
+
+
+def format_answer(tool: str, args: dict, obs) -> str:
+    """Plain-text answer for a trivial tool's observation"""
+    if isinstance(obs, dict) and obs.get("error"):
+        return f"Error: {obs['error']}"
+    if tool == "python_calc":
+        return f"{args.get('expr', '')} = {obs['result']}"
+    if tool == "task_list":
+        if not obs["tasks"]:
+            return "No open tasks."
+        lines = [
+            f"#{t['id']} {t['text']}" + (f" (due {t['due']})" if t["due"] else "") + (f" [p{t['priority']}]" if t["priority"] else "")
+            for t in obs["tasks"]
+        ]
+        if obs["next"]:
+            lines.append("...")
+        return "\n".join(lines)
+    if tool == "task_add":
+        return f"Task #{obs['id']} added: {args.get('text', '')}"
+    if tool == "task_done":
+        if args.get("ids"):
+            return f"Marked {obs['done']} tasks done."
+        if not obs.get("ok"):
+            return f"No task #{args.get('id')}."
+        return f"Task #{args.get('id')} marked done."
+    if tool == "notes_add":
+        return "Note added."
+    if tool == "notes_find":
+        if not obs:
+            return f"No notes matching {args.get('query', '')!r}."
+        return "\n".join(f"#{n['id']} {n['text']}" for n in obs)
+    return str(obs)
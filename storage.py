@@ -0,0 +1,215 @@
+import os, queue, sqlite3, threading
+from contextlib import contextmanager
+from metrics import span
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()  # NORMAL is durable in WAL except on power loss
+DB_CACHE_MB = int(os.getenv("DB_CACHE_MB", "32"))
+DB_MMAP_MB = int(os.getenv("DB_MMAP_MB", "256"))
+DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "10"))  # seconds a writer waits for the lock
+
+# Schema versions, applied in order once per database (tracked in PRAGMA
+# user_version). Append new steps; never edit one that has shipped.
+MIGRATIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS long_memory (k TEXT PRIMARY KEY, v TEXT);
+    CREATE TABLE IF NOT EXISTS conv (id INTEGER PRIMARY KEY, role TEXT, content TEXT);
+    CREATE TABLE IF NOT EXISTS notes (id INTEGER PRIMARY KEY, text TEXT, created_at DEFAULT CURRENT_TIMESTAMP);
+    CREATE TABLE IF NOT EXISTS tasks (id INTEGER PRIMARY KEY, text TEXT, done INTEGER DEFAULT 0, created_at DEFAULT CURRENT_TIMESTAMP);
+    """,
+    # 2: full-text index over notes, kept in sync by triggers and backfilled
+    """
+    CREATE VIRTUAL TABLE notes_fts USING fts5(
+        text, content='notes', content_rowid='id', tokenize='porter unicode61', prefix='2 3'
+    );
+    CREATE TRIGGER notes_ai AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts(rowid, text) VALUES (new.id, new.text);
+    END;
+    CREATE TRIGGER notes_ad AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END;
+    CREATE TRIGGER notes_au AFTER UPDATE OF text ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO notes_fts(rowid, text) VALUES (new.id, new.text);
+    END;
+    INSERT INTO notes_fts(notes_fts) VALUES ('rebuild');
+    """,
+    # 3: task due dates, priority and tags (also indexed in task_tags). The rank_* generated columns give
+    # the listing order (priority desc, due asc with undated last, id) as plain
+    # ascending columns, so keyset pages are an index range seek.
+    """
+    ALTER TABLE tasks ADD COLUMN due TEXT;
+    ALTER TABLE tasks ADD COLUMN priority INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE tasks ADD COLUMN tags TEXT NOT NULL DEFAULT '';
+    ALTER TABLE tasks ADD COLUMN rank_priority INTEGER GENERATED ALWAYS AS (-priority) VIRTUAL;
+    ALTER TABLE tasks ADD COLUMN rank_due TEXT GENERATED ALWAYS AS (COALESCE(due, '9999-12-31')) VIRTUAL;
+    CREATE INDEX tasks_rank ON tasks(done, rank_priority, rank_due, id);
+    CREATE INDEX tasks_due ON tasks(done, due) WHERE due IS NOT NULL;
+    CREATE TABLE task_tags (tag TEXT, task_id INTEGER, PRIMARY KEY (tag, task_id)) WITHOUT ROWID;
+    """,
+    # 4: sessions. conv, notes and tasks belong to a session_id, which leads
+    # every index they are read through, so one tenant's reads never scan
+    # another's rows. notes_fts indexes the session as one opaque token
+    # (session_key) that searches filter on.
+    """
+    ALTER TABLE conv ADD COLUMN session_id TEXT NOT NULL DEFAULT 'default';
+    CREATE INDEX conv_session ON conv(session_id, id);
+    ALTER TABLE notes ADD COLUMN session_id TEXT NOT NULL DEFAULT 'default';
+    ALTER TABLE notes ADD COLUMN session_key TEXT GENERATED ALWAYS AS ('s' || hex(session_id) || '0') VIRTUAL;
+    CREATE INDEX notes_session ON notes(session_id, id);
+    DROP TRIGGER notes_ai;
+    DROP TRIGGER notes_ad;
+    DROP TRIGGER notes_au;
+    DROP TABLE notes_fts;
+    CREATE VIRTUAL TABLE notes_fts USING fts5(
+        text, session_key, content='notes', content_rowid='id', tokenize='porter unicode61', prefix='2 3'
+    );
+    CREATE TRIGGER notes_ai AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts(rowid, text, session_key) VALUES (new.id, new.text, new.session_key);
+    END;
+    CREATE TRIGGER notes_ad AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, text, session_key) VALUES ('delete', old.id, old.text, old.session_key);
+    END;
+    CREATE TRIGGER notes_au AFTER UPDATE OF text, session_id ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, text, session_key) VALUES ('delete', old.id, old.text, old.session_key);
+        INSERT INTO notes_fts(rowid, text, session_key) VALUES (new.id, new.text, new.session_key);
+    END;
+    INSERT INTO notes_fts(notes_fts) VALUES ('rebuild');
+    ALTER TABLE tasks ADD COLUMN session_id TEXT NOT NULL DEFAULT 'default';
+    DROP INDEX tasks_rank;
+    DROP INDEX tasks_due;
+    CREATE INDEX tasks_rank ON tasks(session_id, done, rank_priority, rank_due, id);
+    CREATE INDEX tasks_due ON tasks(session_id, done, due) WHERE due IS NOT NULL;
+    CREATE TABLE task_tags_v4 (session_id TEXT, tag TEXT, task_id INTEGER, PRIMARY KEY (session_id, tag, task_id)) WITHOUT ROWID;
+    INSERT INTO task_tags_v4 SELECT 'default', tag, task_id FROM task_tags;
+    DROP TABLE task_tags;
+    ALTER TABLE task_tags_v4 RENAME TO task_tags;
+    """,
+]
+
+DEFAULT_SESSION = "default"
+
+_dbs = {}
+_lock = threading.Lock()
+
+
+def _statements(script: str):
+    """Split a migration script into statements (trigger bodies stay whole)"""
+    buf = ""
+    for part in script.split(";"):
+        buf += part + ";"
+        if sqlite3.complete_statement(buf):
+            if buf.strip(" \n;"):
+                yield buf.strip()
+            buf = ""
+
+
+class Database:
+    """Thread-safe pool of tuned SQLite connections to one database file.
+
+    Connections run in WAL mode (readers never block the writer) with a busy
+    timeout instead of failing with "database is locked", and are reused
+    across requests rather than opened per operation.
+    """
+
+    def __init__(self, path: str, size: int = DB_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        with self.connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+        self.migrate()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=DB_BUSY_TIMEOUT, check_same_thread=False)
+        conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA cache_size={-DB_CACHE_MB * 1024}")
+        conn.execute(f"PRAGMA mmap_size={DB_MMAP_MB * 1024 * 1024}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                return self._open()
+        return self._idle.get()
+
+    def _release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            # never hand out a connection holding someone else's open transaction
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """A pooled connection; callers commit their own writes"""
+        with span("sqlite"):
+            conn = self._acquire()
+            try:
+                yield conn
+            finally:
+                self._release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """A pooled connection inside one transaction, committed on success"""
+        with self.connection() as conn:
+            with conn:
+                yield conn
+
+    def migrate(self):
+        with self.connection() as conn:
+            migrate(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def migrate(conn: sqlite3.Connection):
+    """Apply pending MIGRATIONS, each atomically with its user_version bump.
+
+    Steps run under BEGIN IMMEDIATE and re-read the version, so several
+    processes starting at once apply every step exactly once.
+    """
+    isolation = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= len(MIGRATIONS):
+                conn.execute("COMMIT")
+                break
+            try:
+                for stmt in _statements(MIGRATIONS[version]):
+                    conn.execute(stmt)
+                conn.execute(f"PRAGMA user_version={version + 1}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    finally:
+        conn.isolation_level = isolation
+
+
+def get_db(path: str) -> Database:
+    """The shared, migrated Database for path"""
+    key = os.path.abspath(path)
+    db = _dbs.get(key)
+    if db is None:
+        with _lock:
+            db = _dbs.get(key)
+            if db is None:
+                db = _dbs[key] = Database(path)
+    return db
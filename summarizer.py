@@ -0,0 +1,83 @@
+import os, time, threading
+from concurrent.futures import ThreadPoolExecutor
+from context import truncate_text
+
+CONV_SUMMARY = os.getenv("CONV_SUMMARY", "true").lower() == "true"
+SUMMARY_THRESHOLD = int(os.getenv("SUMMARY_THRESHOLD", "16"))  # unsummarized messages that trigger a fold
+SUMMARY_KEEP = int(os.getenv("SUMMARY_KEEP", "8"))  # newest messages always left raw
+SUMMARY_BATCH = int(os.getenv("SUMMARY_BATCH", "40"))  # messages folded per LLM call
+SUMMARY_TOKENS = int(os.getenv("SUMMARY_TOKENS", "400"))
+SUMMARY_KEY = "conversation_summary"
+
+MESSAGE_TOKENS = 200  # each folded message is cut to this before summarizing
+
+# one worker folds for every session, so idle sessions cost no threads
+_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jarvis-summary")
+
+SYSTEM = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Merge the new messages into the existing summary. Keep facts, decisions, names, numbers, "
+    "open questions and user preferences; drop small talk. Reply with the updated summary only, "
+    "under 200 words."
+)
+
+
+def load(mem) -> dict:
+    """Stored summary: {"text", "upto_id"}; upto_id is the last conv id folded in"""
+    return mem.get(SUMMARY_KEY, {"text": "", "upto_id": 0})
+
+
+class Summarizer:
+    """Folds one session's older turns into a rolling summary in long_memory.
+
+    Runs on the shared summary worker so it never adds latency to a request. Each
+    fold reads the stored summary, summarizes the next batch of turns after
+    its upto_id and writes {"text", "upto_id"} back, but only if no one else
+    advanced upto_id meanwhile. A crash or restart just repeats a fold that
+    was never written, so the summary stays consistent.
+    """
+
+    def __init__(self, mem, llm_call):
+        self.mem = mem
+        self.llm_call = llm_call
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self.last_error = None
+
+    def schedule(self):
+        """Queue a fold check unless one is already queued"""
+        with self._lock:
+            if self._scheduled:
+                return None
+            self._scheduled = True
+        return _pool.submit(self._run)
+
+    def _run(self):
+        with self._lock:
+            self._scheduled = False
+        try:
+            while self.fold_once():
+                pass
+        except Exception as e:
+            # raw history is still used meanwhile; the next turn retries
+            self.last_error = str(e)
+
+    def fold_once(self) -> bool:
+        """Fold one batch if the backlog passed the threshold; True if it did"""
+        state = load(self.mem)
+        rows = self.mem.conv_after(state["upto_id"], SUMMARY_THRESHOLD + SUMMARY_KEEP + SUMMARY_BATCH)
+        if len(rows) < SUMMARY_THRESHOLD + SUMMARY_KEEP:
+            return False
+        fold = rows[:len(rows) - SUMMARY_KEEP][:SUMMARY_BATCH]  # not rows[:-keep]: keep may be 0
+        if not fold:
+            return False
+        transcript = "\n".join(f"{role}: {truncate_text(content, MESSAGE_TOKENS)}" for _, role, content in fold)
+        text = self.llm_call([
+            {"role": "system", "content": SYSTEM},
+            {"role": "user", "content": f"Current summary:\n{state['text'] or '(none)'}\n\nNew messages:\n{transcript}"},
+        ])
+        if load(self.mem)["upto_id"] != state["upto_id"]:
+            # another worker or process folded these turns first
+            return False
+        self.mem.set(SUMMARY_KEY, {"text": truncate_text(text.strip(), SUMMARY_TOKENS), "upto_id": fold[-1][0], "updated": time.time()})
+        return True
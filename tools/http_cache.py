@@ -0,0 +1,212 @@
+import os, json, time, sqlite3, threading
+from executor import run_blocking
+
+
+HTTP_CACHE = os.getenv("HTTP_CACHE", "true").lower() == "true"
+HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", os.path.join(".cache", "http_cache.sqlite3"))
+HTTP_CACHE_MAX_MB = float(os.getenv("HTTP_CACHE_MAX_MB", "200"))
+
+# Freshness per source type, in seconds
+TTL = {
+    "web_search": int(os.getenv("WEB_SEARCH_TTL", "3600")),
+    "news_search": int(os.getenv("NEWS_SEARCH_TTL", "900")),
+    "page": int(os.getenv("PAGE_TTL", "86400")),
+}
+MAX_PAGE_CHARS = 32000  # cleaned text kept per URL; callers slice further
+
+_cache = None
+_lock = threading.Lock()
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class HttpCache:
+    """SQLite-backed TTL cache for search results and cleaned page text.
+
+    Entries past their TTL are kept (until evicted) so pages can be
+    revalidated with ETag / Last-Modified instead of re-downloaded. The
+    table is held under max_bytes by evicting least recently used entries.
+    """
+
+    def __init__(self, path: str = HTTP_CACHE_PATH, max_bytes: int = int(HTTP_CACHE_MAX_MB * 1024 * 1024)):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_bytes = max_bytes
+        self.counters = {"hits": 0, "misses": 0, "stale": 0, "revalidated": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (kind TEXT, key TEXT, value TEXT, etag TEXT, last_modified TEXT, "
+            "expires REAL, used REAL, size INTEGER, PRIMARY KEY (kind, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries(used)")
+        self._conn.commit()
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def lookup(self, kind: str, key: str):
+        """(value, fresh, etag, last_modified), or None when absent"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires, etag, last_modified FROM entries WHERE kind=? AND key=?", (kind, key)
+            ).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            now = time.time()
+            self._conn.execute("UPDATE entries SET used=? WHERE kind=? AND key=?", (now, kind, key))
+            self._conn.commit()
+            fresh = row[1] > now
+            self.counters["hits" if fresh else "stale"] += 1
+            return json.loads(row[0]), fresh, row[2], row[3]
+
+    def put(self, kind: str, key: str, value, etag: str = None, last_modified: str = None, ttl: int = None):
+        blob = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM entries WHERE kind=? AND key=?", (kind, key)).fetchone()
+            self._conn.execute(
+                "REPLACE INTO entries(kind, key, value, etag, last_modified, expires, used, size) VALUES (?,?,?,?,?,?,?,?)",
+                (kind, key, blob, etag, last_modified, now + (TTL[kind] if ttl is None else ttl), now, len(blob)),
+            )
+            self._bytes += len(blob) - (old[0] if old else 0)
+            if self._bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def refresh(self, kind: str, key: str):
+        """Extend a revalidated (304) entry's freshness"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE entries SET expires=?, used=? WHERE kind=? AND key=?", (now + TTL[kind], now, kind, key))
+            self._conn.commit()
+            self.counters["revalidated"] += 1
+
+    def _evict(self):
+        # drop least recently used entries until 90% of the budget
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT kind, key, size FROM entries ORDER BY used").fetchall()
+        drop = []
+        for kind, key, size in rows:
+            if self._bytes <= target:
+                break
+            drop.append((kind, key))
+            self._bytes -= size
+        self._conn.executemany("DELETE FROM entries WHERE kind=? AND key=?", drop)
+        self.counters["evicted"] += len(drop)
+
+    def stats(self) -> dict:
+        with self._lock:
+            c = dict(self.counters)
+            c["entries"] = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = c["hits"] + c["misses"] + c["stale"]
+        c["hit_rate"] = round((c["hits"] + c["revalidated"]) / lookups, 3) if lookups else 0.0
+        c["bytes"] = self._bytes
+        return c
+
+
+def get_cache():
+    global _cache
+    if _cache is None and HTTP_CACHE:
+        with _lock:
+            if _cache is None:
+                _cache = HttpCache()
+    return _cache
+
+
+async def _aget_cache():
+    """get_cache() for coroutines: the first open runs off the event loop"""
+    if _cache is not None or not HTTP_CACHE:
+        return _cache
+    return await run_blocking(get_cache)
+
+
+def stats() -> dict:
+    cache = get_cache()
+    return cache.stats() if cache else {"enabled": False}
+
+
+async def astats() -> dict:
+    """stats() for coroutines: the entry count query runs on the shared pool"""
+    return await run_blocking(stats)
+
+
+# -------- helpers used by the tools --------
+
+def cached(kind: str, key: str, compute):
+    """Return a fresh cached value for (kind, key) or compute and store it"""
+    cache = get_cache()
+    if cache is None:
+        return compute()
+    hit = cache.lookup(kind, key)
+    if hit and hit[1]:
+        return hit[0]
+    value = compute()
+    cache.put(kind, key, value)
+    return value
+
+
+async def acached(kind: str, key: str, acompute):
+    """Async cached: SQLite reads and writes run on the shared pool, not the event loop"""
+    cache = await _aget_cache()
+    if cache is None:
+        return await acompute()
+    hit = await run_blocking(cache.lookup, kind, key)
+    if hit and hit[1]:
+        return hit[0]
+    value = await acompute()
+    await run_blocking(cache.put, kind, key, value)
+    return value
+
+
+def _conditional_headers(hit) -> dict:
+    headers = {}
+    if hit and hit[2]:
+        headers["If-None-Match"] = hit[2]
+    if hit and hit[3]:
+        headers["If-Modified-Since"] = hit[3]
+    return headers
+
+
+def cached_page(url: str, fetch, clean) -> str:
+    """Cleaned page text for url, revalidating stale entries.
+
+    fetch(url, headers) -> response with status_code, text and headers
+    clean(html) -> str
+    """
+    cache = get_cache()
+    if cache is None:
+        return clean(fetch(url, {}).text)
+    hit = cache.lookup("page", url)
+    if hit and hit[1]:
+        return hit[0]
+    r = fetch(url, _conditional_headers(hit))
+    if r.status_code == 304 and hit:
+        cache.refresh("page", url)
+        return hit[0]
+    text = clean(r.text)[:MAX_PAGE_CHARS]
+    if r.status_code >= 400:
+        # never cache error pages
+        return text
+    cache.put("page", url, text, etag=r.headers.get("ETag"), last_modified=r.headers.get("Last-Modified"))
+    return text
+
+
+async def acached_page(url: str, afetch, aclean) -> str:
+    """Async cached_page: afetch and aclean are coroutines; cache I/O runs on the shared pool"""
+    cache = await _aget_cache()
+    if cache is None:
+        return await aclean((await afetch(url, {})).text)
+    hit = await run_blocking(cache.lookup, "page", url)
+    if hit and hit[1]:
+        return hit[0]
+    r = await afetch(url, _conditional_headers(hit))
+    if r.status_code == 304 and hit:
+        await run_blocking(cache.refresh, "page", url)
+        return hit[0]
+    text = (await aclean(r.text))[:MAX_PAGE_CHARS]
+    if r.status_code >= 400:
+        return text
+    await run_blocking(cache.put, "page", url, text, etag=r.headers.get("ETag"), last_modified=r.headers.get("Last-Modified"))
+    return text
@@ -1,15 +1,24 @@
-import os, time, json
+import os, time, json, asyncio
 from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
 import requests, httpx
 from tenacity import retry, stop_after_attempt, wait_fixed
 from bs4 import BeautifulSoup
 from readability import Document
 from ddgs import DDGS
+from executor import run_blocking
+from tools import http_cache
+from metrics import bound, count, timed
 
 DEFAULT_TIMEOUT = 15
 MAX_ARTICLE_CHARS = 8000
 MAX_OBS_CHARS = 4000
 
+# Parallel fetch / summarize knobs
+FETCH_CANDIDATES = int(os.getenv("NEWS_FETCH_CANDIDATES", "6"))  # URLs fetched concurrently
+FETCH_DEADLINE = float(os.getenv("NEWS_FETCH_DEADLINE", "12"))  # seconds for the whole fetch stage
+SUMMARY_PARALLELISM = int(os.getenv("NEWS_SUMMARY_PARALLELISM", "3"))  # concurrent map-step LLM calls
+
 # Simple credibility scores (0..1). Adjust as you like.
 TRUST = {
     "bbc.com": 0.95,
@@ -25,16 +34,35 @@ NEWS_API_PROVIDER = os.getenv("NEWS_API_PROVIDER", "GNEWS").upper()
 NEWS_API_KEY = os.getenv("NEWS_API_KEY", "")
 NEWS_COUNTRY = os.getenv("NEWS_COUNTRY", "in")
 
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-def _fetch(url: str) -> str:
-    r = requests.get(url, timeout=DEFAULT_TIMEOUT, headers={"User-Agent": "Mozilla/5.0"})
+_aclient = None
+
+
+def _count_retry(state):
+    count("jarvis_fetch_retries")
+
+
+@timed("fetch")
+@retry(stop=stop_after_attempt(3), wait=wait_fixed(2), before_sleep=_count_retry)
+def _fetch(url: str, headers: dict = None):
+    r = requests.get(url, timeout=DEFAULT_TIMEOUT, headers={"User-Agent": "Mozilla/5.0", **(headers or {})})
+    r.raise_for_status()
+    return r
+
+
+@timed("fetch")
+@retry(stop=stop_after_attempt(3), wait=wait_fixed(2), before_sleep=_count_retry)
+async def _afetch(url: str, headers: dict = None):
+    global _aclient
+    if _aclient is None:
+        _aclient = httpx.AsyncClient(timeout=DEFAULT_TIMEOUT, follow_redirects=True, headers={"User-Agent": "Mozilla/5.0"})
+    r = await _aclient.get(url, headers=headers)
     r.raise_for_status()
-    return r.text
+    return r
 
-def _clean(html: str) -> str:
+def _clean(html: str, max_chars: int = MAX_ARTICLE_CHARS) -> str:
     doc = Document(html)
     txt = BeautifulSoup(doc.summary(), "lxml").get_text(" ")
-    return txt[:MAX_ARTICLE_CHARS]
+    return txt[:max_chars]
 
 # -------- API paths --------
 
@@ -73,7 +101,7 @@ def _ddg_news(query: str, max_results: int = 8):
         return list(ddgs.text(query + " site:reuters.com OR site:bbc.com OR site:ndtv.com OR site:thehindu.com OR site:indianexpress.com", max_results=max_results))
 
 
-def search_news(query: str, max_results: int = 8):
+def _search_news(query: str, max_results: int = 8):
     # Prefer API if available
     if USE_NEWS_API and NEWS_API_KEY:
         return _news_api_search(query, max_results=max_results)
@@ -82,17 +110,72 @@ def search_news(query: str, max_results: int = 8):
     return [{"title": r.get("title"), "href": r.get("href"), "source": r.get("source") or ""} for r in rows]
 
 
-def multi_fetch_and_merge(urls: list[str], top_k: int = 3):
+@timed("search", source="news")
+def search_news(query: str, max_results: int = 8):
+    key = f"{http_cache.normalize_query(query)}|{max_results}|{NEWS_API_PROVIDER if USE_NEWS_API else 'ddg'}"
+    return http_cache.cached("news_search", key, lambda: _search_news(query, max_results))
+
+
+def _fetch_text(url: str) -> str:
+    # cleaned text is cached per URL and revalidated with ETag/Last-Modified
+    text = http_cache.cached_page(url, _fetch, lambda html: _clean(html, http_cache.MAX_PAGE_CHARS))
+    return text[:MAX_ARTICLE_CHARS]
+
+
+def multi_fetch_and_merge(urls: list[str], top_k: int = 3, candidates: int = FETCH_CANDIDATES, deadline: float = FETCH_DEADLINE):
+    """Fetch the first `candidates` URLs concurrently and keep the first top_k
+    usable articles to finish. Whatever hasn't finished by the deadline is
+    abandoned, so one dead site can't hold up the step.
+    """
     texts, used = [], []
-    for u in urls[:top_k]:
-        try:
-            html = _fetch(u)
-            txt = _clean(html)
+    targets = urls[:max(candidates, top_k)]
+    pool = ThreadPoolExecutor(max_workers=max(1, len(targets)))
+    futures = {pool.submit(bound(_fetch_text), u): u for u in targets}
+    try:
+        for fut in as_completed(futures, timeout=deadline):
+            try:
+                txt = fut.result()
+            except Exception:
+                continue
             if len(txt) > 200:
                 texts.append(txt)
-                used.append(u)
-        except Exception:
-            continue
+                used.append(futures[fut])
+                if len(texts) >= top_k:
+                    break
+    except FuturesTimeout:
+        pass
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    merged = "\n\n".join(texts)[:MAX_ARTICLE_CHARS]
+    return merged, used
+
+
+async def _afetch_text(url: str) -> str:
+    async def aclean(html):
+        return await run_blocking(_clean, html, http_cache.MAX_PAGE_CHARS)
+
+    text = await http_cache.acached_page(url, _afetch, aclean)
+    return text[:MAX_ARTICLE_CHARS]
+
+
+async def amulti_fetch_and_merge(urls: list[str], top_k: int = 3, candidates: int = FETCH_CANDIDATES, deadline: float = FETCH_DEADLINE):
+    texts, used = [], []
+    tasks = {asyncio.ensure_future(_afetch_text(u)): u for u in urls[:max(candidates, top_k)]}
+    pending = set(tasks)
+    end = time.monotonic() + deadline
+    try:
+        while pending and len(texts) < top_k:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None and len(t.result()) > 200 and len(texts) < top_k:
+                    texts.append(t.result())
+                    used.append(tasks[t])
+    finally:
+        for t in pending:
+            t.cancel()
     merged = "\n\n".join(texts)[:MAX_ARTICLE_CHARS]
     return merged, used
 
@@ -103,6 +186,41 @@ def credibility(url: str) -> float:
             return score
     return 0.5
 
+# -------- Summarization prompts --------
+
+def _digest_msgs(items):
+    bullets = "\n".join(f"- {i['title']} ({i.get('source','')})" for i in items[:6])
+    return [
+        {"role":"system", "content":"Write a crisp 6-bullet digest of today's news from the list. Each bullet ≤ 20 words."},
+        {"role":"user", "content": bullets}
+    ]
+
+
+def _partial_msgs(chunk: str):
+    return [
+        {"role":"system","content":"Summarize this news content into 3 sharp bullets with dates, names, and numbers."},
+        {"role":"user","content": chunk}
+    ]
+
+
+def _merge_msgs(partials: list[str]):
+    return [
+        {"role":"system","content":"Merge these partial news summaries into a single 6-bullet India-first digest, include sources if inferable."},
+        {"role":"user","content": "\n".join(partials)}
+    ]
+
+
+def _ranked(items):
+    # sort by credibility
+    items = sorted(items, key=lambda x: credibility(x.get("href","")), reverse=True)
+    return items, [i["href"] for i in items if i.get("href")]
+
+
+def _out_items(items):
+    # annotate items with credibility
+    return [{**i, "weight": credibility(i.get("href",""))} for i in items[:8]]
+
+
 # High-level function the agent can call
 
 def news_bundle(query: str, llm_call, max_results: int = 8):
@@ -114,40 +232,45 @@ def news_bundle(query: str, llm_call, max_results: int = 8):
     if not items:
         return {"items": [], "summary": "No news found.", "citations": []}
 
-    # sort by credibility
-    items = sorted(items, key=lambda x: credibility(x.get("href","")), reverse=True)
-    urls = [i["href"] for i in items if i.get("href")]
-
+    items, urls = _ranked(items)
     merged, used_urls = multi_fetch_and_merge(urls, top_k=3)
 
     if not merged:
         # fallback: summarize titles/snippets only
-        bullets = "\n".join(f"- {i['title']} ({i.get('source','')})" for i in items[:6])
-        msg = [
-            {"role":"system", "content":"Write a crisp 6-bullet digest of today's news from the list. Each bullet ≤ 20 words."},
-            {"role":"user", "content": bullets}
-        ]
-        summary = llm_call(msg)
+        summary = llm_call(_digest_msgs(items))
         cites = [i["href"] for i in items[:6] if i.get("href")]
-        # attach weights
-        out_items = [{**i, "weight": credibility(i.get("href",""))} for i in items[:8]]
-        return {"items": out_items, "summary": summary, "citations": cites}
+        return {"items": _out_items(items), "summary": summary, "citations": cites}
 
     # hierarchical summarization
     chunks = [merged[i:i+2000] for i in range(0, len(merged), 2000)]
-    partials = []
-    for c in chunks:
-        msg = [
-            {"role":"system","content":"Summarize this news content into 3 sharp bullets with dates, names, and numbers."},
-            {"role":"user","content": c}
-        ]
-        partials.append(llm_call(msg))
-    msg = [
-        {"role":"system","content":"Merge these partial news summaries into a single 6-bullet India-first digest, include sources if inferable."},
-        {"role":"user","content": "\n".join(partials)}
-    ]
-    final = llm_call(msg)
+    # map step runs concurrently (order preserved), then one merge call
+    with ThreadPoolExecutor(max_workers=max(1, min(SUMMARY_PARALLELISM, len(chunks)))) as pool:
+        partials = [f.result() for f in [pool.submit(bound(llm_call), _partial_msgs(c)) for c in chunks]]
+    final = llm_call(_merge_msgs(partials))
+    return {"items": _out_items(items), "summary": final, "citations": used_urls}
 
-    # annotate items with credibility
-    out_items = [{**i, "weight": credibility(i.get("href",""))} for i in items[:8]]
-    return {"items": out_items, "summary": final, "citations": used_urls}
+
+async def anews_bundle(query: str, allm_call, max_results: int = 8):
+    """Async news_bundle; allm_call: async callable(messages:list[dict]) -> str"""
+    items = await run_blocking(search_news, query, max_results)
+    if not items:
+        return {"items": [], "summary": "No news found.", "citations": []}
+
+    items, urls = _ranked(items)
+    merged, used_urls = await amulti_fetch_and_merge(urls, top_k=3)
+
+    if not merged:
+        summary = await allm_call(_digest_msgs(items))
+        cites = [i["href"] for i in items[:6] if i.get("href")]
+        return {"items": _out_items(items), "summary": summary, "citations": cites}
+
+    chunks = [merged[i:i+2000] for i in range(0, len(merged), 2000)]
+    sem = asyncio.Semaphore(SUMMARY_PARALLELISM)
+
+    async def summarize(c):
+        async with sem:
+            return await allm_call(_partial_msgs(c))
+
+    partials = await asyncio.gather(*(summarize(c) for c in chunks))
+    final = await allm_call(_merge_msgs(partials))
+    return {"items": _out_items(items), "summary": final, "citations": used_urls}
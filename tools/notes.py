@@ -1,19 +1,69 @@
-import sqlite3
+import os, re, sqlite3
+from storage import DEFAULT_SESSION
+
+# bm25 ranks at most this many of the newest matches, so words that occur in
+# most notes still answer in milliseconds; rarer words are ranked exactly
+NOTES_SEARCH_CANDIDATES = int(os.getenv("NOTES_SEARCH_CANDIDATES", "5000"))
+
+_WORD = re.compile(r"\w+")
 
 
 def ensure(conn):
-    conn.execute("CREATE TABLE IF NOT EXISTS notes (id INTEGER PRIMARY KEY, text TEXT, created_at DEFAULT CURRENT_TIMESTAMP)")
-    conn.commit()
+    """Bring a bare connection's database up to the current schema (the agent's is migrated by storage)"""
+    from storage import migrate
+    migrate(conn)
 
 
-def add(conn, text: str):
-    ensure(conn)
-    conn.execute("INSERT INTO notes(text) VALUES (?)", (text,))
+def add(conn, text: str, session_id: str = DEFAULT_SESSION):
+    conn.execute("INSERT INTO notes(session_id, text) VALUES (?,?)", (session_id, text))
     conn.commit()
     return {"ok": True}
 
 
-def find(conn, q: str, limit: int = 10):
-    ensure(conn)
-    cur = conn.execute("SELECT id, text, created_at FROM notes WHERE text LIKE ? ORDER BY id DESC LIMIT ?", (f"%{q}%", limit))
-    return [{"id": i, "text": t, "ts": ts} for (i,t,ts) in cur.fetchall()]
\ No newline at end of file
+def match_expr(q: str, op: str = "AND") -> str:
+    """FTS5 query over q's words (stemmed); the last one also matches as a
+    prefix ("buy gro" finds "buy groceries"). Prefix terms cost a doclist
+    merge, so earlier, complete words match exactly."""
+    words = list(dict.fromkeys(_WORD.findall(q.lower())))
+    return f" {op} ".join(f'"{w}"' + ("*" if i == len(words) - 1 else "") for i, w in enumerate(words))
+
+
+def session_key(session_id: str) -> str:
+    """notes.session_key for session_id: one token the FTS tokenizer and stemmer leave intact"""
+    return f"s{session_id.encode().hex().upper()}0"
+
+
+def _scoped(expr: str, session_id: str) -> str:
+    return f'session_key : "{session_key(session_id)}" AND ({expr})'
+
+
+def find(conn, q: str, limit: int = 10, offset: int = 0, session_id: str = DEFAULT_SESSION):
+    """session_id's notes matching q, best first (bm25), with a highlighted snippet.
+
+    All words must match; if no note has all of them, any word matching is
+    enough. An empty query lists the newest notes. Page with offset.
+    """
+    expr = match_expr(q)
+    if not expr:
+        cur = conn.execute(
+            "SELECT id, text, created_at FROM notes WHERE session_id = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+            (session_id, limit, offset),
+        )
+        return [{"id": i, "text": t, "ts": ts, "score": 0.0, "snippet": t} for (i, t, ts) in cur.fetchall()]
+    if " " in expr and conn.execute(
+        "SELECT 1 FROM notes_fts WHERE notes_fts MATCH ? LIMIT 1", (_scoped(expr, session_id),)
+    ).fetchone() is None:
+        expr = match_expr(q, "OR")
+    # rowid order streams straight off the index, so only the candidates are
+    # scored; the session column is weighted 0 so it does not affect rank
+    rows = conn.execute(
+        "SELECT n.id, n.text, n.created_at, f.score, f.snip FROM ("
+        "SELECT rowid AS id, -bm25(notes_fts, 1.0, 0.0) AS score, snippet(notes_fts, 0, '[', ']', '...', 16) AS snip "
+        "FROM notes_fts WHERE notes_fts MATCH ? ORDER BY rowid DESC LIMIT ?"
+        ") f JOIN notes n ON n.id = f.id ORDER BY f.score DESC LIMIT ? OFFSET ?",
+        (_scoped(expr, session_id), NOTES_SEARCH_CANDIDATES, limit, offset),
+    ).fetchall()
+    return [
+        {"id": i, "text": t, "ts": ts, "score": round(score, 4), "snippet": snip}
+        for (i, t, ts, score, snip) in rows
+    ]
@@ -1,6 +1,347 @@
-# Minimal sandbox: no imports, only math ops, limited builtins
+"""Calculator for python_calc: arithmetic expressions, no eval.
+
+Expressions are parsed with ast, checked against a whitelist (numbers,
++ - * / // % ** and ^ as power, the math functions and constants below,
+list literals) and compiled into nested closures, cached per expression
+string; scalar subexpressions are folded to constants while compiling.
+Lists, tuples, range() and linspace() evaluate element-wise through
+NumPy: "sqrt([1, 4, 9])", "sum(range(1, 101)**2)".
+
+Every operation that can grow without bound is capped: integer results
+(CALC_MAX_BITS), factorial/comb/perm arguments, round() digits, array
+sizes including broadcasts (CALC_MAX_ITEMS), expression length. Array
+work and function calls also check a per-evaluation deadline
+(CALC_TIMEOUT), so one request cannot pin a worker.
+"""
+import os, io, sys, ast, math, time, operator, tokenize
+from functools import lru_cache
+import numpy as np
+
+CALC_CACHE_SIZE = int(os.getenv("CALC_CACHE_SIZE", "1024"))  # compiled expressions kept (LRU)
+CALC_MAX_LENGTH = int(os.getenv("CALC_MAX_LENGTH", "2000"))  # characters
+CALC_MAX_BITS = int(os.getenv("CALC_MAX_BITS", "14000"))  # integer results, ~4200 digits (str() stops at 4300)
+CALC_MAX_ITEMS = int(os.getenv("CALC_MAX_ITEMS", "1000000"))  # elements per array
+CALC_TIMEOUT = float(os.getenv("CALC_TIMEOUT", "0.5"))  # seconds per evaluation
+MAX_ROUND_DIGITS = 400
+_MAX_STR_DIGITS = sys.get_int_max_str_digits()  # 0 = unlimited
+
+
+class CalcError(ValueError):
+    pass
+
+
+def _check_deadline(deadline: float):
+    if time.perf_counter() > deadline:
+        raise CalcError("calculation took too long")
+
+
+def _check_bits(bits: int):
+    if bits > CALC_MAX_BITS:
+        raise CalcError("result too large")
+
+
+def _is_array(*values) -> bool:
+    return any(isinstance(v, np.ndarray) for v in values)
+
+
+def _check_items(n: int):
+    if n > CALC_MAX_ITEMS:
+        raise CalcError("too many items")
+
+
+def _check_broadcast(*values):
+    """Cap the size of the array an element-wise op over values would allocate"""
+    shapes = [v.shape for v in values if isinstance(v, np.ndarray)]
+    if shapes:
+        try:
+            _check_items(math.prod(np.broadcast_shapes(*shapes)))
+        except ValueError as e:
+            raise CalcError(str(e)) from None
+
+
+def _array(values) -> np.ndarray:
+    _check_items(sum(v.size if isinstance(v, np.ndarray) else 1 for v in values))
+    return np.asarray(values, dtype=np.float64)
+
+
+# -------- operators --------
+
+def _mul(a, b, deadline):
+    if type(a) is int and type(b) is int:
+        _check_bits(a.bit_length() + b.bit_length())
+    return a * b
+
+
+def _pow(a, b, deadline):
+    if _is_array(a, b):
+        return np.power(np.asarray(a, dtype=np.float64), b)
+    if type(a) is int and type(b) is int and b > 0 and abs(a) > 1:
+        _check_bits(math.ceil(b * math.log2(abs(a))))
+    out = a ** b
+    if isinstance(out, complex):
+        raise CalcError("complex result")
+    return out
+
+
+def _arith(op):
+    return lambda a, b, deadline: op(a, b)
+
+
+_BINOPS = {
+    ast.Add: _arith(operator.add),
+    ast.Sub: _arith(operator.sub),
+    ast.Mult: _mul,
+    ast.Div: _arith(operator.truediv),
+    ast.FloorDiv: _arith(operator.floordiv),
+    ast.Mod: _arith(operator.mod),
+    ast.Pow: _pow,
+}
+_UNARY = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+
+# -------- functions --------
+
+def _elementwise(scalar, vector):
+    def fn(*args):
+        return vector(*args) if _is_array(*args) else scalar(*args)
+    return fn
+
+
+def _reduce(scalar, vector):
+    """min(1, 2, 3) over its arguments, min([1, 2, 3]) over the array"""
+    def fn(*args):
+        if len(args) == 1 and _is_array(args[0]):
+            return vector(args[0])
+        if _is_array(*args):
+            _check_items(sum(np.size(a) for a in args))
+            return vector(np.concatenate([np.atleast_1d(a) for a in args]))
+        return scalar(args)
+    return fn
+
+
+def _prod(xs):
+    if all(type(x) is int for x in xs):
+        _check_bits(sum(x.bit_length() for x in xs))
+    return math.prod(xs)
+
+
+def _log(x, base=math.e):
+    return np.log(x) / np.log(base) if _is_array(x) else math.log(x, base)
+
+
+def _round(x, ndigits=None):
+    if ndigits is None:
+        # round(2.5) -> 2, an int, like Python's round
+        return np.round(x) if _is_array(x) else round(x)
+    if not -MAX_ROUND_DIGITS <= ndigits <= MAX_ROUND_DIGITS:
+        raise CalcError(f"round digits must be within +-{MAX_ROUND_DIGITS}")
+    return np.round(x, int(ndigits)) if _is_array(x) else round(x, int(ndigits))
+
+
+def _natural(n, name: str) -> int:
+    if n != int(n) or n < 0:
+        raise CalcError(f"{name} needs non-negative integers")
+    return int(n)
+
+
+def _log2_factorial(n: int) -> float:
+    return math.lgamma(n + 1) / math.log(2)
+
+
+def _factorial(n):
+    n = _natural(n, "factorial")
+    _check_bits(int(_log2_factorial(n)))
+    return math.factorial(n)
+
+
+def _perm(n, k):
+    n, k = _natural(n, "perm"), _natural(k, "perm")
+    if k <= n:
+        _check_bits(int(_log2_factorial(n) - _log2_factorial(n - k)))
+    return math.perm(n, k)
+
+
+def _comb(n, k):
+    n, k = _natural(n, "comb"), _natural(k, "comb")
+    if k <= n:
+        _check_bits(int(_log2_factorial(n) - _log2_factorial(k) - _log2_factorial(n - k)))
+    return math.comb(n, k)
+
+
+def _range(*args):
+    if not 1 <= len(args) <= 3:
+        raise CalcError("range takes 1 to 3 arguments")
+    start, stop, step = (0, args[0], 1) if len(args) == 1 else (args[0], args[1], args[2] if len(args) == 3 else 1)
+    if step == 0:
+        raise CalcError("range step must not be zero")
+    if max(0, math.ceil((stop - start) / step)) > CALC_MAX_ITEMS:
+        raise CalcError("too many items")
+    return np.arange(start, stop, step, dtype=np.float64)
+
+
+def _linspace(start, stop, num=50):
+    if not 0 <= num <= CALC_MAX_ITEMS:
+        raise CalcError("too many items")
+    return np.linspace(start, stop, int(num))
+
+
+FUNCTIONS = {
+    "sqrt": _elementwise(math.sqrt, np.sqrt),
+    "exp": _elementwise(math.exp, np.exp),
+    "log": _log,
+    "ln": _elementwise(math.log, np.log),
+    "log10": _elementwise(math.log10, np.log10),
+    "log2": _elementwise(math.log2, np.log2),
+    "sin": _elementwise(math.sin, np.sin),
+    "cos": _elementwise(math.cos, np.cos),
+    "tan": _elementwise(math.tan, np.tan),
+    "asin": _elementwise(math.asin, np.arcsin),
+    "acos": _elementwise(math.acos, np.arccos),
+    "atan": _elementwise(math.atan, np.arctan),
+    "atan2": _elementwise(math.atan2, np.arctan2),
+    "sinh": _elementwise(math.sinh, np.sinh),
+    "cosh": _elementwise(math.cosh, np.cosh),
+    "tanh": _elementwise(math.tanh, np.tanh),
+    "degrees": _elementwise(math.degrees, np.degrees),
+    "radians": _elementwise(math.radians, np.radians),
+    "hypot": _elementwise(math.hypot, np.hypot),
+    "abs": _elementwise(abs, np.abs),
+    "floor": _elementwise(math.floor, np.floor),
+    "ceil": _elementwise(math.ceil, np.ceil),
+    "round": _round,
+    "pow": lambda a, b: _pow(a, b, None),
+    "min": _reduce(min, np.min),
+    "max": _reduce(max, np.max),
+    "sum": _reduce(sum, np.sum),
+    "mean": _reduce(lambda xs: sum(xs) / len(xs), np.mean),
+    "prod": _reduce(_prod, np.prod),
+    "factorial": _factorial,
+    "comb": _comb,
+    "perm": _perm,
+    "gcd": math.gcd,
+    "range": _range,
+    "linspace": _linspace,
+}
+CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau, "inf": math.inf}
+
+
+# -------- compiler --------
+
+def _fold(fn, deadline: float):
+    """Constant-fold a scalar subtree: evaluate once at compile time.
+
+    Arrays stay lazy (the cache would pin them in memory), and so does
+    anything that fails, so the error surfaces from calc() as usual.
+    """
+    try:
+        value = fn(deadline)
+    except Exception:
+        return fn
+    if isinstance(value, np.ndarray):
+        return fn
+    return lambda deadline: value
+
+
+def _compile(node, deadline: float):
+    """Closure (deadline) -> value for a whitelisted AST node"""
+    if isinstance(node, ast.Expression):
+        return _compile(node.body, deadline)
+    if isinstance(node, ast.Constant):
+        value = node.value
+        if type(value) not in (int, float):
+            raise CalcError(f"unsupported literal {value!r}")
+        return lambda deadline: value
+    if isinstance(node, ast.Name):
+        if node.id not in CONSTANTS:
+            raise CalcError(f"unknown name {node.id!r}")
+        value = CONSTANTS[node.id]
+        return lambda deadline: value
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+        op, operand = _UNARY[type(node.op)], _compile(node.operand, deadline)
+        return _fold(lambda deadline: op(operand(deadline)), deadline)
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINOPS:
+        op, left, right = _BINOPS[type(node.op)], _compile(node.left, deadline), _compile(node.right, deadline)
+
+        def binop(deadline):
+            a, b = left(deadline), right(deadline)
+            if _is_array(a, b):
+                _check_deadline(deadline)
+                _check_broadcast(a, b)
+                with np.errstate(all="ignore"):
+                    return op(a, b, deadline)
+            return op(a, b, deadline)
+        return _fold(binop, deadline)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        fn = FUNCTIONS.get(node.func.id)
+        if fn is None:
+            raise CalcError(f"unknown function {node.func.id!r}")
+        args = [_compile(a, deadline) for a in node.args]
+
+        def call(deadline):
+            values = [a(deadline) for a in args]
+            _check_deadline(deadline)
+            _check_broadcast(*values)
+            with np.errstate(all="ignore"):
+                return fn(*values)
+        return _fold(call, deadline)
+    if isinstance(node, (ast.List, ast.Tuple)):
+        items = [_compile(e, deadline) for e in node.elts]
+        return lambda deadline: _array([i(deadline) for i in items])
+    raise CalcError(f"unsupported syntax: {type(node).__name__}")
+
+
+def _powers(expr: str) -> str:
+    """Calculator notation: every ^ token becomes ** (power, with its precedence)"""
+    tokens = tokenize.generate_tokens(io.StringIO(expr).readline)
+    return tokenize.untokenize(
+        (tok.type, "**" if tok.type == tokenize.OP and tok.string == "^" else tok.string) for tok in tokens
+    )
+
+
+@lru_cache(maxsize=CALC_CACHE_SIZE)
+def compile_expr(expr: str):
+    """Parse and compile expr once; the closure is reused for every later call"""
+    if len(expr) > CALC_MAX_LENGTH:
+        raise CalcError("expression too long")
+    try:
+        tree = ast.parse(_powers(expr.strip()), mode="eval")
+        return _compile(tree, time.perf_counter() + CALC_TIMEOUT)
+    except SyntaxError as e:
+        raise CalcError(f"invalid expression: {e.msg}") from None
+    except tokenize.TokenError as e:
+        raise CalcError(f"invalid expression: {e.args[0]}") from None
+    except RecursionError:
+        raise CalcError("expression nested too deeply") from None
+
+
+def _plain(value):
+    """JSON-friendly result: arrays become lists, integral NumPy values ints"""
+    if isinstance(value, np.ndarray):
+        if value.size and np.all(np.isfinite(value)) and np.all(value == np.round(value)) and np.abs(value).max() < 2 ** 53:
+            return value.astype(np.int64).tolist()
+        return value.tolist()
+    if isinstance(value, np.generic):
+        value = value.item()
+        if isinstance(value, float) and value.is_integer() and abs(value) < 2 ** 53:
+            return int(value)
+    if type(value) is int and _MAX_STR_DIGITS and value.bit_length() * math.log10(2) >= _MAX_STR_DIGITS - 1:
+        # backstop for anything the per-op caps missed: str() of it would raise later
+        raise CalcError("result too large")
+    return value
 
 
 def calc(expr: str):
-    allowed_names = {k: __builtins__[k] for k in ("abs","round")}
-    return eval(expr, {"__builtins__": None}, allowed_names)
\ No newline at end of file
+    """Evaluate a calculator expression, e.g. "2^10 + sqrt(100)" -> 1034.0.
+
+    Raises CalcError for anything outside the whitelist or the limits, and
+    for math errors (division by zero, domain, overflow).
+    """
+    fn = compile_expr(expr)
+    try:
+        return _plain(fn(time.perf_counter() + CALC_TIMEOUT))
+    except CalcError:
+        raise
+    except OverflowError:
+        raise CalcError("result too large") from None
+    except (ArithmeticError, ValueError, TypeError, RecursionError) as e:
+        raise CalcError(str(e) or type(e).__name__) from None
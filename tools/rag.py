@@ -1,17 +1,15 @@
-import os, chromadb
-from sentence_transformers import SentenceTransformer
-import re
-from typing import List, Dict, Tuple
+import os
+from typing import List, Tuple
 import numpy as np
+from embeddings import encode, get_model
+from lexical_index import chunk_features, get_index as get_lexical
+from vector_store import VECTOR_BACKEND, get_store
+from metrics import span
 
 
-EMBED = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 CHROMA_DIR = os.getenv("CHROMA_DIR", ".chroma")
-
-
-_model = None
-_client = chromadb.PersistentClient(path=CHROMA_DIR)
-_col = _client.get_or_create_collection("jarvis_knowledge")
+RAG_MODE = os.getenv("RAG_MODE", "hybrid")  # hybrid | vector
+RRF_K = 60  # reciprocal rank fusion constant
 
 
 # Query expansion terms for better semantic matching
@@ -25,13 +23,6 @@ QUERY_EXPANSIONS = {
 }
 
 
-def _embedder():
-    global _model
-    if _model is None:
-        _model = SentenceTransformer(EMBED)
-    return _model
-
-
 def expand_query(query: str) -> str:
     """Expand query with related terms for better semantic matching"""
     expanded_terms = []
@@ -57,37 +48,25 @@ def expand_query(query: str) -> str:
     return query
 
 
-def calculate_relevance_score(doc: str, query: str, metadata: dict) -> float:
-    """Calculate relevance score for better ranking"""
+def static_score(doc: str, metadata: dict) -> float:
+    """Query-independent part of the relevance score.
+
+    Uses the features rag_index stores in chunk metadata; older indexes
+    without them fall back to scanning the text.
+    """
+    if "has_pct" not in metadata:
+        metadata = {**chunk_features(doc), **metadata}
     score = 0.0
-    doc_lower = doc.lower()
-    query_lower = query.lower()
-    
-    # Exact phrase matches (highest weight)
-    if query_lower in doc_lower:
-        score += 2.0
-    
-    # Individual word matches
-    query_words = set(query_lower.split())
-    doc_words = set(doc_lower.split())
-    word_overlap = len(query_words.intersection(doc_words))
-    score += word_overlap * 0.5
     
     # Boost for chunks with numbers/percentages (likely results)
-    if re.search(r'\d+%', doc):
+    if metadata["has_pct"]:
         score += 0.8
     
     # Boost for chunks with evaluation terms
-    eval_terms = ["accuracy", "precision", "recall", "f1", "performance", "results", "evaluation"]
-    for term in eval_terms:
-        if term in doc_lower:
-            score += 0.3
+    score += 0.3 * metadata["eval_terms"]
     
     # Boost for methodology sections
-    method_terms = ["method", "approach", "algorithm", "technique", "methodology"]
-    for term in method_terms:
-        if term in doc_lower:
-            score += 0.2
+    score += 0.2 * metadata["method_terms"]
     
     # Length penalty (prefer concise, relevant chunks)
     word_count = metadata.get("word_count", len(doc.split()))
@@ -99,53 +78,151 @@ def calculate_relevance_score(doc: str, query: str, metadata: dict) -> float:
     return score
 
 
-def query(q: str, k: int = 4) -> List[Tuple[str, dict]]:
-    """Enhanced query with better semantic matching and ranking"""
-    # Expand query for better semantic matching
-    expanded_query = expand_query(q)
+def calculate_relevance_score(doc: str, query: str, metadata: dict) -> float:
+    """Calculate relevance score for better ranking"""
+    score = 0.0
+    doc_lower = doc.lower()
+    query_lower = query.lower()
     
-    # Get more results initially for better re-ranking
-    initial_k = min(k * 3, 20)  # Get more candidates
-    e = _embedder().encode([expanded_query])[0]
-    res = _col.query(query_embeddings=[e], n_results=initial_k)
-    
-    docs = res.get("documents", [[]])[0]
-    metas = res.get("metadatas", [[]])[0]
-    distances = res.get("distances", [[]])[0]
-    
-    # Calculate enhanced relevance scores
-    candidates = []
-    for i, (doc, meta, dist) in enumerate(zip(docs, metas, distances)):
-        # Combine semantic similarity with relevance scoring
-        semantic_score = 1.0 / (1.0 + dist)  # Convert distance to similarity
-        relevance_score = calculate_relevance_score(doc, q, meta)
-        
-        # Weighted combination
-        final_score = 0.6 * semantic_score + 0.4 * relevance_score
-        
-        candidates.append({
-            "doc": doc,
-            "meta": meta,
-            "score": final_score,
-            "semantic_score": semantic_score,
-            "relevance_score": relevance_score
-        })
-    
-    # Sort by final score
-    candidates.sort(key=lambda x: x["score"], reverse=True)
+    # Exact phrase matches (highest weight)
+    if query_lower in doc_lower:
+        score += 2.0
+    
+    # Individual word matches
+    query_words = set(query_lower.split())
+    doc_words = set(doc_lower.split())
+    word_overlap = len(query_words.intersection(doc_words))
+    score += word_overlap * 0.5
+    
+    return score + static_score(doc, metadata)
+
+
+def _vector_candidates(queries: List[str], initial_k: int) -> list:
+    """One embed call and one vector store round trip for all queries"""
+    embs = encode([expand_query(q) for q in queries])
+    with span("vector_query", backend=VECTOR_BACKEND):
+        res = get_store().query(query_embeddings=embs, n_results=initial_k)
+    cols = [res.get(key) or [[]] * len(queries) for key in ("ids", "documents", "metadatas", "distances")]
+    return [list(zip(*(c[i] for c in cols))) for i in range(len(queries))]
+
+
+def _static_scores(docs: List[str], metas: List[dict]) -> np.ndarray:
+    """Vectorized static_score over a candidate list"""
+    feats = [m if "has_pct" in m else {**chunk_features(d), **m} for d, m in zip(docs, metas)]
+    has_pct = np.array([bool(f["has_pct"]) for f in feats], dtype=float)
+    eval_terms = np.array([f["eval_terms"] for f in feats], dtype=float)
+    method_terms = np.array([f["method_terms"] for f in feats], dtype=float)
+    word_count = np.array([f.get("word_count", len(d.split())) for f, d in zip(feats, docs)], dtype=float)
+    return 0.8 * has_pct + 0.3 * eval_terms + 0.2 * method_terms - 0.1 * (word_count > 300) - 0.2 * (word_count < 50)
+
+
+def _term_scores(q: str, docs: List[str], words: dict) -> np.ndarray:
+    """Vectorized phrase + word-overlap part of calculate_relevance_score"""
+    query_lower = q.lower()
+    query_words = set(query_lower.split())
+    phrase = np.array([query_lower in d.lower() for d in docs], dtype=float)
+    overlap = np.array([len(query_words & words[d]) for d in docs], dtype=float)
+    return 2.0 * phrase + 0.5 * overlap
+
+
+def _rank(docs: List[str], metas: List[dict], score: np.ndarray, semantic: np.ndarray,
+          relevance: np.ndarray, k: int, lexical: np.ndarray = None) -> List[Tuple[str, dict]]:
+    # Sort by final score (stable, so ties keep candidate order)
+    order = np.argsort(-score, kind="stable")[:k]
     
     # Return top k results with enhanced metadata
     results = []
-    for candidate in candidates[:k]:
-        meta = candidate["meta"].copy()
-        meta["relevance_score"] = round(candidate["relevance_score"], 3)
-        meta["semantic_score"] = round(candidate["semantic_score"], 3)
-        meta["final_score"] = round(candidate["score"], 3)
-        results.append((candidate["doc"], meta))
-    
+    for i in order:
+        meta = metas[i].copy()
+        meta["relevance_score"] = round(float(relevance[i]), 3)
+        meta["semantic_score"] = round(float(semantic[i]), 3)
+        meta["final_score"] = round(float(score[i]), 3)
+        if lexical is not None:
+            meta["lexical_score"] = round(float(lexical[i]), 3)
+        results.append((docs[i], meta))
     return results
 
 
+def _rank_vector(q: str, cands: list, k: int, words: dict) -> List[Tuple[str, dict]]:
+    if not cands:
+        return []
+    _, docs, metas, dists = zip(*cands)
+    
+    # Combine semantic similarity with relevance scoring
+    semantic = 1.0 / (1.0 + np.asarray(dists, dtype=float))  # Convert distance to similarity
+    relevance = _term_scores(q, docs, words) + _static_scores(docs, metas)
+    
+    # Weighted combination
+    score = 0.6 * semantic + 0.4 * relevance
+    return _rank(docs, metas, score, semantic, relevance, k)
+
+
+def _rank_hybrid(q: str, cands: list, k: int, initial_k: int) -> List[Tuple[str, dict]]:
+    """Reciprocal rank fusion of the vector and BM25 candidate lists.
+
+    The query-dependent lexical signal comes from BM25 instead of rescanning
+    chunk text; only the precomputed static features are added on top.
+    """
+    pos, docs, metas = {}, [], []
+    lexical_hits = get_lexical().search(q, initial_k)
+    for cid, doc, meta in [(c[0], c[1], c[2]) for c in cands] + [(c[0], c[2], c[3]) for c in lexical_hits]:
+        if cid not in pos:
+            pos[cid] = len(docs)
+            docs.append(doc)
+            metas.append(meta)
+    if not docs:
+        return []
+    
+    n = len(docs)
+    rrf, semantic, lexical = np.zeros(n), np.zeros(n), np.zeros(n)
+    vec_idx = np.array([pos[c[0]] for c in cands], dtype=int)
+    lex_idx = np.array([pos[c[0]] for c in lexical_hits], dtype=int)
+    if len(vec_idx):
+        semantic[vec_idx] = 1.0 / (1.0 + np.array([c[3] for c in cands], dtype=float))
+        rrf[vec_idx] += 1.0 / (RRF_K + np.arange(1, len(vec_idx) + 1))
+    if len(lex_idx):
+        lexical[lex_idx] = [c[1] for c in lexical_hits]
+        rrf[lex_idx] += 1.0 / (RRF_K + np.arange(1, len(lex_idx) + 1))
+    
+    relevance = _static_scores(docs, metas)
+    score = rrf / rrf.max() + 0.1 * relevance
+    return _rank(docs, metas, score, semantic, relevance, k, lexical)
+
+
+def query_batch(queries: List[str], k: int = 4, mode: str = None) -> List[List[Tuple[str, dict]]]:
+    """Run several queries at once; element i equals query(queries[i], k, mode).
+
+    All queries are embedded in one model call and sent to the vector store
+    in one round trip; reranking works on NumPy arrays per query.
+    """
+    if not queries:
+        return []
+    mode = (mode or RAG_MODE).lower()
+    hybrid = mode == "hybrid" and not get_lexical().is_empty()
+    # Get more results initially for better re-ranking
+    initial_k = max(k * 5, 20) if hybrid else min(k * 3, 20)
+    all_cands = _vector_candidates(queries, initial_k)
+    
+    if hybrid:
+        return [_rank_hybrid(q, cands, k, initial_k) for q, cands in zip(queries, all_cands)]
+    # Word sets are computed once per distinct candidate across the batch
+    words = {}
+    for cands in all_cands:
+        for c in cands:
+            if c[1] not in words:
+                words[c[1]] = set(c[1].lower().split())
+    return [_rank_vector(q, cands, k, words) for q, cands in zip(queries, all_cands)]
+
+
+def query(q: str, k: int = 4, mode: str = None) -> List[Tuple[str, dict]]:
+    """Enhanced query with better semantic matching and ranking
+
+    mode: "hybrid" (BM25 + vector, fused) or "vector"; defaults to RAG_MODE.
+    Hybrid falls back to vector when no lexical index has been built yet.
+    """
+    return query_batch([q], k, mode)[0]
+
+
 def query_for_agent(q: str, k: int = 4) -> List[Tuple[str, str]]:
     """RAG query function that returns the format expected by the agent"""
     enhanced_results = query(q, k)
@@ -155,3 +232,10 @@ def query_for_agent(q: str, k: int = 4) -> List[Tuple[str, str]]:
         path = meta.get("source", "Unknown")
         agent_results.append((doc, path))
     return agent_results
+
+
+def warmup():
+    """Load the embedding model, vector store and lexical index ahead of the first query"""
+    get_model().encode(["warmup"])
+    get_store()
+    get_lexical()
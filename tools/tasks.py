@@ -1,31 +1,131 @@
 import sqlite3
+from datetime import date, datetime, timedelta
+from storage import DEFAULT_SESSION
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+_COLUMNS = "id, text, done, created_at, due, priority, tags, rank_priority, rank_due"
 
 
 def ensure(conn):
-    conn.execute("CREATE TABLE IF NOT EXISTS tasks (id INTEGER PRIMARY KEY, text TEXT, done INTEGER DEFAULT 0, created_at DEFAULT CURRENT_TIMESTAMP)")
-    conn.commit()
+    """Bring a bare connection's database up to the current schema (the agent's is migrated by storage)"""
+    from storage import migrate
+    migrate(conn)
 
 
-def add(conn, text: str):
-    ensure(conn)
-    conn.execute("INSERT INTO tasks(text) VALUES (?)", (text,))
-    conn.commit()
-    return {"ok": True}
+def _due(value):
+    """Normalize a due date/datetime to sortable ISO text ("2025-05-01" or "2025-05-01 17:00")"""
+    if not value:
+        return None
+    dt = datetime.fromisoformat(str(value).strip())
+    return dt.date().isoformat() if len(str(value).strip()) <= 10 else dt.isoformat(sep=" ", timespec="minutes")
+
+
+def _tag(value: str) -> str:
+    return value.strip().lower().lstrip("#")
+
+
+def _tags(value) -> list:
+    if not value:
+        return []
+    items = value.split(",") if isinstance(value, str) else value
+    return list(dict.fromkeys(_tag(t) for t in items if t and _tag(t)))
 
 
+def _insert(conn, item, session_id: str) -> int:
+    if isinstance(item, str):
+        item = {"text": item}
+    tags = _tags(item.get("tags"))
+    task_id = conn.execute(
+        "INSERT INTO tasks(session_id, text, due, priority, tags) VALUES (?,?,?,?,?)",
+        (session_id, item["text"], _due(item.get("due")), int(item.get("priority") or 0), ",".join(tags)),
+    ).lastrowid
+    conn.executemany(
+        "INSERT INTO task_tags(session_id, tag, task_id) VALUES (?,?,?)", [(session_id, t, task_id) for t in tags]
+    )
+    return task_id
 
 
-def list_tasks(conn, only_open=True):
-    ensure(conn)
-    q = "SELECT id,text,done,created_at FROM tasks WHERE done=0 ORDER BY id DESC" if only_open else "SELECT id,text,done,created_at FROM tasks ORDER BY id DESC"
-    cur = conn.execute(q)
-    return [{"id": i, "text": t, "done": d==1, "ts": ts} for (i,t,d,ts) in cur.fetchall()]
+def add(conn, text: str, due=None, priority: int = 0, tags=None, session_id: str = DEFAULT_SESSION):
+    with conn:
+        task_id = _insert(conn, {"text": text, "due": due, "priority": priority, "tags": tags}, session_id)
+    return {"ok": True, "id": task_id}
 
 
+def add_many(conn, items: list, session_id: str = DEFAULT_SESSION):
+    """Add tasks (texts or {"text", "due", "priority", "tags"} dicts) in one transaction"""
+    with conn:
+        ids = [_insert(conn, i, session_id) for i in items]
+    return {"ok": True, "ids": ids}
 
 
-def mark_done(conn, task_id: int):
-    ensure(conn)
-    conn.execute("UPDATE tasks SET done=1 WHERE id=?", (task_id,))
+def _cursor(row) -> str:
+    return f"{row[2]}|{row[7]}|{row[8]}|{row[0]}"
+
+
+def list_tasks(conn, only_open=True, limit: int = PAGE_SIZE, cursor: str = None,
+               min_priority: int = None, tag: str = None, due_before=None, session_id: str = DEFAULT_SESSION):
+    """One page of session_id's tasks, most urgent first: priority desc, then due date
+    (undated last), then id.
+
+    Pass the returned "next" as cursor for the following page (keyset
+    pagination: every page is an index seek, however many tasks exist).
+    Filters: min_priority, tag, due_before (date or datetime, inclusive).
+    """
+    where, params = ["session_id = ?"], [session_id]
+    if only_open:
+        where.append("done = 0")
+    if min_priority is not None:
+        where.append("rank_priority <= ?")
+        params.append(-int(min_priority))
+    if tag:
+        where.append("id IN (SELECT task_id FROM task_tags WHERE session_id = ? AND tag = ?)")
+        params += [session_id, _tag(tag)]
+    if due_before:
+        bound = _due(due_before)
+        if len(bound) == 10:
+            # a bare date covers the whole day, including tasks due at a time on it
+            where.append("due < ?")
+            params.append((date.fromisoformat(bound) + timedelta(days=1)).isoformat())
+        else:
+            where.append("due <= ?")
+            params.append(bound)
+    if cursor:
+        done, prio, due, last_id = cursor.split("|")
+        # with done pinned by only_open, leave it out so the row value seeks the index
+        if only_open:
+            where.append("(rank_priority, rank_due, id) > (?,?,?)")
+        else:
+            where.append("(done, rank_priority, rank_due, id) > (?,?,?,?)")
+            params.append(int(done))
+        params += [int(prio), due, int(last_id)]
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    rows = conn.execute(
+        f"SELECT {_COLUMNS} FROM tasks WHERE {' AND '.join(where)} "
+        "ORDER BY done, rank_priority, rank_due, id LIMIT ?",
+        params + [limit + 1],
+    ).fetchall()
+    page = rows[:limit]
+    return {
+        "tasks": [
+            {"id": i, "text": t, "done": d == 1, "ts": ts, "due": due, "priority": p, "tags": tags.split(",") if tags else []}
+            for (i, t, d, ts, due, p, tags, _, _) in page
+        ],
+        "next": _cursor(page[-1]) if len(rows) > limit else None,
+    }
+
+
+def mark_done(conn, task_id: int, session_id: str = DEFAULT_SESSION):
+    cur = conn.execute("UPDATE tasks SET done=1 WHERE id=? AND session_id=?", (task_id, session_id))
     conn.commit()
-    return {"ok": True}
\ No newline at end of file
+    # ok is False for ids that do not exist in this session
+    return {"ok": cur.rowcount > 0}
+
+
+def mark_done_many(conn, task_ids: list, session_id: str = DEFAULT_SESSION):
+    """Complete several tasks in one transaction"""
+    ids = [int(i) for i in task_ids]
+    with conn:
+        cur = conn.executemany("UPDATE tasks SET done=1 WHERE id=? AND session_id=?", [(i, session_id) for i in ids])
+    return {"ok": True, "done": cur.rowcount}
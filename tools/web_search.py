@@ -1,17 +1,66 @@
 from ddgs import DDGS
-import requests
+import requests, httpx
 from bs4 import BeautifulSoup
 from readability import Document
+from executor import run_blocking
+from tools import http_cache
+from metrics import timed
 
+_aclient = None
 
-def search(query: str, max_results: int = 5):
+
+def _search(query: str, max_results: int = 5):
     with DDGS() as ddgs:
         results = list(ddgs.text(query, max_results=max_results))
     return [{"title": r.get("title"), "href": r.get("href"), "snippet": r.get("body")} for r in results]
 
 
-def fetch_clean(url: str, max_chars: int = 4000):
-    html = requests.get(url, timeout=15).text
+@timed("search", source="web")
+def search(query: str, max_results: int = 5):
+    key = f"{http_cache.normalize_query(query)}|{max_results}"
+    return http_cache.cached("web_search", key, lambda: _search(query, max_results))
+
+
+def clean_html(html: str, max_chars: int = 4000):
     doc = Document(html)
     txt = BeautifulSoup(doc.summary(), "lxml").get_text(" ")
     return txt[:max_chars]
+
+
+def _get(url: str, headers: dict):
+    return requests.get(url, timeout=15, headers=headers)
+
+
+@timed("fetch")
+def fetch_clean(url: str, max_chars: int = 4000):
+    text = http_cache.cached_page(url, _get, lambda html: clean_html(html, http_cache.MAX_PAGE_CHARS))
+    return text[:max_chars]
+
+
+# -------- async variants --------
+
+def _client():
+    global _aclient
+    if _aclient is None:
+        _aclient = httpx.AsyncClient(timeout=15, follow_redirects=True)
+    return _aclient
+
+
+@timed("search", source="web")
+async def asearch(query: str, max_results: int = 5):
+    # ddgs is synchronous; keep it off the event loop
+    key = f"{http_cache.normalize_query(query)}|{max_results}"
+    return await http_cache.acached("web_search", key, lambda: run_blocking(_search, query, max_results))
+
+
+@timed("fetch")
+async def afetch_clean(url: str, max_chars: int = 4000):
+    async def aget(u, headers):
+        return await _client().get(u, headers=headers)
+
+    async def aclean(html):
+        # readability/lxml parsing is CPU-bound
+        return await run_blocking(clean_html, html, http_cache.MAX_PAGE_CHARS)
+
+    text = await http_cache.acached_page(url, aget, aclean)
+    return text[:max_chars]
@@ -0,0 +1,292 @@
+import os, json, sqlite3, threading
+from typing import List
+import numpy as np
+
+
+CHROMA_DIR = os.getenv("CHROMA_DIR", ".chroma")
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()  # chroma | local
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join(CHROMA_DIR, "local"))
+LOCAL_IVF_LISTS = int(os.getenv("LOCAL_IVF_LISTS", "0"))  # 0 = exact search
+LOCAL_IVF_PROBES = int(os.getenv("LOCAL_IVF_PROBES", "8"))
+COLLECTION = "jarvis_knowledge"
+
+_store = None
+_client = None
+_lock = threading.Lock()
+
+
+class LocalVectorStore:
+    """In-process vector index with the subset of the Chroma collection API we use.
+
+    Normalized float32 embeddings are appended to a raw matrix file that is
+    memory-mapped for search; ids, documents and metadata live in an SQLite
+    sidecar mapping chunk id -> matrix row. Deleted rows become tombstones
+    until compact(). Search is exact top-k by dot product, or IVF when
+    ivf_lists > 0 and optimize() has trained the partitions. Distances are
+    squared L2 between unit vectors, the same scale Chroma reports.
+    """
+
+    def __init__(self, path: str = LOCAL_INDEX_DIR, ivf_lists: int = LOCAL_IVF_LISTS, ivf_probes: int = LOCAL_IVF_PROBES):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.ivf_lists = ivf_lists
+        self.ivf_probes = ivf_probes
+        self._vec_path = os.path.join(path, "vectors.f32")
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(path, "meta.sqlite3"), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS rows (row INTEGER PRIMARY KEY, cid TEXT UNIQUE, doc TEXT, meta TEXT);
+            CREATE TABLE IF NOT EXISTS info (k TEXT PRIMARY KEY, v TEXT);
+        """)
+        self._db.commit()
+        self._version = None
+        self._load()
+
+    # -------- state --------
+
+    def _load(self):
+        """(Re)read shape, live-row mask and IVF state from disk"""
+        row = self._db.execute("SELECT v FROM info WHERE k='dim'").fetchone()
+        self.dim = int(row[0]) if row else None
+        size = os.path.getsize(self._vec_path) if os.path.exists(self._vec_path) else 0
+        self.n = size // (4 * self.dim) if self.dim else 0
+        self._mat = np.memmap(self._vec_path, dtype=np.float32, mode="r", shape=(self.n, self.dim)) if self.n else None
+        self.alive = np.zeros(self.n, dtype=bool)
+        rows = [r for (r,) in self._db.execute("SELECT row FROM rows")]
+        if rows:
+            self.alive[np.array(rows, dtype=np.int64)] = True
+        self._centroids, self._assign = None, None
+        ivf = os.path.join(self.path, "ivf.npz")
+        if self.ivf_lists and os.path.exists(ivf):
+            data = np.load(ivf)
+            self._centroids = data["centroids"]
+            self._assign = np.full(self.n, -1, dtype=np.int32)
+            m = min(self.n, len(data["assign"]))
+            self._assign[:m] = data["assign"][:m]
+        self._version = self._db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _refresh(self):
+        # data_version changes when another connection (e.g. the indexer) commits
+        if self._db.execute("PRAGMA data_version").fetchone()[0] != self._version:
+            self._load()
+
+    def _drop_rows(self, ids: List[str]) -> list:
+        """Delete ids from the sidecar (uncommitted); returns their matrix rows"""
+        rows = []
+        for i in range(0, len(ids), 500):
+            part = ids[i:i+500]
+            rows += [r for (r,) in self._db.execute(
+                f"SELECT row FROM rows WHERE cid IN ({','.join('?' * len(part))})", part
+            )]
+        self._db.executemany("DELETE FROM rows WHERE cid=?", [(i,) for i in ids])
+        return rows
+
+    def _applied(self, dead: list, added: int = 0):
+        """Update in-memory state after our own commit instead of re-reading every row.
+
+        Falls back to _load() when another connection committed meanwhile.
+        """
+        if self._db.execute("PRAGMA data_version").fetchone()[0] != self._version:
+            self._load()
+            return
+        if added:
+            self.n += added
+            self._mat = np.memmap(self._vec_path, dtype=np.float32, mode="r", shape=(self.n, self.dim))
+            self.alive = np.concatenate([self.alive, np.ones(added, dtype=bool)])
+            if self._assign is not None:
+                self._assign = np.concatenate([self._assign, np.full(added, -1, dtype=np.int32)])
+        if dead:
+            self.alive[np.array(dead, dtype=np.int64)] = False
+
+    # -------- Chroma-compatible API --------
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return int(self.alive.sum())
+
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[dict], embeddings):
+        vecs = np.asarray(embeddings, dtype=np.float32)
+        if not len(ids):
+            return
+        vecs = vecs / np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            self._refresh()
+            if self.dim is None:
+                self.dim = vecs.shape[1]
+                self._db.execute("REPLACE INTO info(k, v) VALUES ('dim', ?)", (str(self.dim),))
+            elif vecs.shape[1] != self.dim:
+                raise ValueError(f"embedding dim {vecs.shape[1]} != index dim {self.dim}")
+            dead = self._drop_rows(ids)
+            start = self.n
+            with open(self._vec_path, "ab") as fh:
+                fh.write(vecs.tobytes())
+            self._db.executemany(
+                "INSERT INTO rows(row, cid, doc, meta) VALUES (?,?,?,?)",
+                [(start + j, i, d, json.dumps(m)) for j, (i, d, m) in enumerate(zip(ids, documents, metadatas))],
+            )
+            self._db.commit()
+            self._applied(dead, len(vecs))
+            if self._centroids is not None:
+                self._assign[start:] = np.argmax(vecs @ self._centroids.T, axis=1)
+                self._save_ivf()
+
+    add = upsert
+
+    def delete(self, ids: List[str] = None):
+        with self._lock:
+            self._refresh()
+            dead = self._drop_rows(list(ids or []))
+            self._db.commit()
+            self._applied(dead)
+
+    def get(self, ids: List[str], include=None) -> dict:
+        with self._lock:
+            self._refresh()
+            found = {}
+            for i in range(0, len(ids), 500):
+                part = ids[i:i+500]
+                marks = ",".join("?" * len(part))
+                for cid, row, doc, meta in self._db.execute(
+                    f"SELECT cid, row, doc, meta FROM rows WHERE cid IN ({marks})", part
+                ):
+                    found[cid] = (row, doc, meta)
+            out_ids = [i for i in ids if i in found]
+            return {
+                "ids": out_ids,
+                "embeddings": [np.array(self._mat[found[i][0]]) for i in out_ids],
+                "documents": [found[i][1] for i in out_ids],
+                "metadatas": [json.loads(found[i][2]) for i in out_ids],
+            }
+
+    def query(self, query_embeddings, n_results: int = 10) -> dict:
+        q = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        q = q / np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+        out = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self._lock:
+            self._refresh()
+            live = np.flatnonzero(self.alive)
+            if self._centroids is None and len(live):
+                # exact search: one matmul over the mapped matrix for every query
+                all_sims = (np.asarray(self._mat) @ q.T)[live]
+            for j, qv in enumerate(q):
+                if self._centroids is None:
+                    rows = live
+                    sims = all_sims[:, j] if len(live) else None
+                else:
+                    rows = self._candidates(qv, live)
+                    sims = self._mat[rows] @ qv
+                if not len(rows):
+                    for key in out:
+                        out[key].append([])
+                    continue
+                k = min(n_results, len(rows))
+                top = np.argpartition(-sims, k - 1)[:k]
+                top = top[np.argsort(-sims[top], kind="stable")]
+                picked = [int(r) for r in rows[top]]
+                meta = {
+                    r: (cid, doc, m) for r, cid, doc, m in self._db.execute(
+                        f"SELECT row, cid, doc, meta FROM rows WHERE row IN ({','.join('?' * len(picked))})", picked
+                    )
+                }
+                out["ids"].append([meta[r][0] for r in picked])
+                out["documents"].append([meta[r][1] for r in picked])
+                out["metadatas"].append([json.loads(meta[r][2]) for r in picked])
+                out["distances"].append([float(2.0 - 2.0 * s) for s in sims[top]])
+        return out
+
+    # -------- maintenance --------
+
+    def _candidates(self, qv: np.ndarray, live: np.ndarray) -> np.ndarray:
+        probes = np.argsort(-(self._centroids @ qv))[:self.ivf_probes]
+        assign = self._assign[live]
+        # rows not yet assigned (-1) are always scanned
+        return live[np.isin(assign, probes) | (assign < 0)]
+
+    def _save_ivf(self):
+        np.savez(os.path.join(self.path, "ivf.npz"), centroids=self._centroids, assign=self._assign)
+
+    def compact(self):
+        """Rewrite the matrix without tombstoned rows"""
+        with self._lock:
+            self._refresh()
+            live = np.flatnonzero(self.alive)
+            if len(live) == self.n:
+                return
+            tmp = self._vec_path + ".tmp"
+            with open(tmp, "wb") as fh:
+                for i in range(0, len(live), 8192):
+                    fh.write(np.asarray(self._mat[live[i:i+8192]]).tobytes())
+            remap = {int(old): new for new, old in enumerate(live)}
+            rows = self._db.execute("SELECT row, cid FROM rows").fetchall()
+            self._db.execute("UPDATE rows SET row = -row - 1")
+            self._db.executemany("UPDATE rows SET row=? WHERE cid=?", [(remap[r], cid) for r, cid in rows])
+            self._db.commit()
+            self._mat = None
+            os.replace(tmp, self._vec_path)
+            if self._assign is not None:
+                self._assign = self._assign[live]
+                self._save_ivf()
+            self._load()
+
+    def optimize(self, iters: int = 10):
+        """Compact, then (re)train IVF partitions with a few k-means rounds"""
+        self.compact()
+        if not self.ivf_lists:
+            return
+        with self._lock:
+            live = np.flatnonzero(self.alive)
+            if len(live) < self.ivf_lists * 4:
+                return
+            data = np.asarray(self._mat[live])
+            rng = np.random.default_rng(0)
+            sample = data[rng.choice(len(data), min(len(data), self.ivf_lists * 256), replace=False)]
+            cent = sample[rng.choice(len(sample), self.ivf_lists, replace=False)].copy()
+            for _ in range(iters):
+                lab = np.argmax(sample @ cent.T, axis=1)
+                for c in range(self.ivf_lists):
+                    members = sample[lab == c]
+                    if len(members):
+                        cent[c] = members.mean(axis=0)
+                cent /= np.maximum(np.linalg.norm(cent, axis=1, keepdims=True), 1e-12)
+            self._centroids = cent
+            self._assign = np.full(self.n, -1, dtype=np.int32)
+            for i in range(0, len(live), 65536):
+                part = live[i:i+65536]
+                self._assign[part] = np.argmax(data[i:i+65536] @ cent.T, axis=1)
+            self._save_ivf()
+
+    def reset(self):
+        with self._lock:
+            self._db.executescript("DELETE FROM rows; DELETE FROM info;")
+            self._db.commit()
+            self._mat = None
+            for f in (self._vec_path, os.path.join(self.path, "ivf.npz")):
+                if os.path.exists(f):
+                    os.remove(f)
+            self._load()
+
+
+def get_store(reset: bool = False):
+    """The configured vector store (VECTOR_BACKEND), opened on first use"""
+    global _store, _client
+    with _lock:
+        if VECTOR_BACKEND == "local":
+            if _store is None:
+                _store = LocalVectorStore()
+            if reset:
+                _store.reset()
+        else:
+            if _client is None:
+                import chromadb
+                _client = chromadb.PersistentClient(path=CHROMA_DIR)
+            if reset:
+                try:
+                    _client.delete_collection(COLLECTION)
+                except Exception:
+                    # Collection doesn't exist yet
+                    pass
+                _store = None
+            if _store is None:
+                _store = _client.get_or_create_collection(COLLECTION)
+    return _store